@@ -0,0 +1,50 @@
+from fastapi import HTTPException
+
+# Общая часть пакетных запросов к услугам и проектам: ограничение размера пакета
+# и ответ с результатом по каждому элементу
+
+# Максимум элементов в одном пакетном запросе
+BATCH_MAX_ITEMS = 1000
+
+def check_batch_size(items: list):
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Не больше {BATCH_MAX_ITEMS} элементов за запрос")
+
+def split_duplicates(items: list):
+    """Элементы для изменения и индексы повторов: повтор id или нового названия внутри пакета — конфликт"""
+    seen_ids, seen_names, duplicates = set(), set(), set()
+    for index, item in enumerate(items):
+        if item.id in seen_ids or item.name in seen_names:
+            duplicates.add(index)
+        seen_ids.add(item.id)
+        seen_names.add(item.name)
+    return [item for index, item in enumerate(items) if index not in duplicates], duplicates
+
+def created_results(items: list, created: dict, conflict: str):
+    """created — {название: id} добавленных строк; повтор названия внутри пакета — тоже конфликт"""
+    created = dict(created)
+    results = []
+    for index, item in enumerate(items):
+        if item.name in created:
+            results.append({"index": index, "id": created.pop(item.name), "status": "created"})
+        else:
+            results.append({"index": index, "status": "conflict", "detail": conflict})
+    return results
+
+def updated_results(items: list, updated: set, found: set, duplicates: set, conflict: str, not_found: str):
+    results = []
+    for index, item in enumerate(items):
+        if item.id in updated and index not in duplicates:
+            results.append({"index": index, "id": item.id, "status": "updated"})
+        elif item.id in found or index in duplicates:
+            results.append({"index": index, "id": item.id, "status": "conflict", "detail": conflict})
+        else:
+            results.append({"index": index, "id": item.id, "status": "not_found", "detail": not_found})
+    return results
+
+def deleted_results(ids: list, deleted: set, not_found: str):
+    return [
+        {"index": index, "id": item_id, "status": "deleted"} if item_id in deleted
+        else {"index": index, "id": item_id, "status": "not_found", "detail": not_found}
+        for index, item_id in enumerate(ids)
+    ]
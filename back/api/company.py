@@ -1,14 +1,21 @@
-from fastapi import Depends, HTTPException, status, Query, APIRouter
-from sqlalchemy import select, func, insert, update, delete
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import IntegrityError
-from asyncpg.exceptions import UniqueViolationError, ForeignKeyViolationError
-from database import database, engine
-from models import companies, reviews, services, projects, users
-from schemas import  CompanyCreate, CompanyUpdate, CompanyModel, CompanyListModel, CompanyDetail, ServiceModel, ReviewModel, ProjectModel
-from utils import get_current_user, validate_phone_number, validate_email, validate_inn
+from fastapi import Depends, HTTPException, status, Query, APIRouter, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func, insert, update, tuple_, or_, literal, literal_column
+from decimal import Decimal
+import io
+import csv
+import json
+from collections import Counter
+from asyncpg.exceptions import UniqueViolationError, ForeignKeyViolationError, PostgresError
+from database import database
+from models import companies, services, users, company_stats
+from schemas import  CompanyCreate, CompanyUpdate, CompanyModel, CompanyListModel, CompanyDetail
+from utils import get_current_user, validate_phone_number, validate_email, validate_inn, encode_cursor, decode_cursor
 from typing import List
 from decorators import role_required, is_company_owner
+from stats import refresh_company_stats, update_service_names
+from responses import FastJSONResponse, dumps, loads, etag_headers, not_modified
+from cache import company_cache, company_version, invalidate_company, catalog_cache, catalog_version, company_owners, company_etag, catalog_etag
 
 router = APIRouter()
 
@@ -20,102 +27,337 @@ router = APIRouter()
 async def create_update_company(company_data: dict, current_user: dict = Depends(get_current_user)):
     validate_company_data(company_data)
 
-    session = sessionmaker(bind=engine)()
+    is_update = bool(company_data.get("id"))
+    company_id = await save_company(company_data, current_user)
+    # Владелец запоминается только после фиксации транзакции: при откате в кеше не останется чужого id
+    if not is_update:
+        company_owners.set(company_id, current_user["user_id"])
+    invalidate_company(company_id)
 
-    company_id = company_data.get("id")
-    services_data = company_data.pop("services", [])
-    projects_data = company_data.pop("projects", [])
+    return {"id": company_id, "message": "Компания успешно " + ("обновлена" if is_update else "добавлена")}
 
-    if company_id:
-        existing_company = session.execute(select(companies).where(companies.c.id == company_id)).fetchone()
-        
-        if not existing_company:
-            raise HTTPException(
-                status_code=404,
-                detail="Организация не найдена"
-            )
+# Поля компании, которые можно записать через API и импорт
+COMPANY_FIELDS = ("name", "description", "staff", "email", "inn", "phone_number", "site")
 
-        if current_user["role"] != 'admin' and existing_company.user_id != current_user["user_id"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="У вас нет прав для обновления данной огранизации"
-            )
+async def save_company(company_data: dict, current_user: dict):
+    """Создает или обновляет компанию вместе с услугами и проектами в одной транзакции"""
+    company_data = dict(company_data)
+    company_id = company_data.pop("id", None)
+    services_data = company_data.pop("services", None) or []
+    projects_data = company_data.pop("projects", None) or []
 
-        stmt = update(companies).where(companies.c.id == company_id).values(**company_data)
-        try:
-            session.execute(stmt)
-        except IntegrityError:
-            raise HTTPException(status_code=400, detail="У данного пользователя уже есть компания с таким именем")
-    else:
-        stmt = insert(companies).values(**company_data,
-            rating=0, 
-            user_id=current_user['user_id'])
+    unknown = sorted(set(company_data) - set(COMPANY_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=400, detail="Неизвестные поля компании: " + ", ".join(unknown))
 
-        try:
-            result = session.execute(stmt)
-            company_id = result.inserted_primary_key[0]  # Получаем ID новой компании
-        except IntegrityError:
-            raise HTTPException(status_code=400, detail="У данного пользователя уже есть компания с таким именем")
-
-    # Синхронизация отзывов
-    existing_service_ids = set([r["id"] for r in services_data if "id" in r])
-    existing_services = session.execute(select(services).where(services.c.company_id == company_id)).fetchall()
-
-    # Удаляем отзывы, которые больше не включены в запрос
-    for service in existing_services:
-        if service.id not in existing_service_ids:
-            stmt = delete(services).where(services.c.id == service.id)
-            session.execute(stmt)
-
-    # Добавляем/обновляем отзывы
-    for service_data in services_data:
-        if "id" in service_data:
-            stmt = update(services).where(services.c.id == service_data["id"]).values(service_data)
+    check_unique_names(services_data, "У данного организации уже есть услуга с наименованием ")
+    check_unique_names(projects_data, "У данного организации уже есть проект с названием ")
+
+    async with database.transaction():
+        if company_id:
+            existing_company = await database.fetch_one(select(companies.c.user_id).where(companies.c.id == company_id))
+
+            if not existing_company:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Организация не найдена"
+                )
+
+            if current_user["role"] != 'admin' and existing_company["user_id"] != current_user["user_id"]:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="У вас нет прав для обновления данной огранизации"
+                )
+
+            stmt = update(companies).where(companies.c.id == company_id).values(**company_data)
+            try:
+                await database.execute(stmt)
+            except UniqueViolationError:
+                raise HTTPException(status_code=400, detail="У данного пользователя уже есть компания с таким именем")
         else:
-            service_data["company_id"] = company_id
-            stmt = insert(services).values(service_data)
+            stmt = insert(companies).values(**company_data,
+                rating=0, 
+                user_id=current_user['user_id'])
+
+            try:
+                company_id = await database.execute(stmt)
+            except UniqueViolationError:
+                raise HTTPException(status_code=400, detail="У данного пользователя уже есть компания с таким именем")
+
+        service_name_deltas = await sync_services(company_id, services_data)
+        await sync_projects(company_id, projects_data)
+        await refresh_company_stats(company_id)
+        await update_service_names(service_name_deltas)
+
+    return company_id
+
+# Максимум ошибок с подробностями в ответе импорта, остальные только считаются
+MAX_IMPORT_ERRORS = 1000
+
+# Поля выгрузки (/export), которые при импорте отбрасываются: импорт всегда создает новые компании,
+# а рейтинг и сводные значения считаются заново. Поэтому выгруженный файл можно загрузить обратно
+EXPORT_ONLY_FIELDS = ("id", "rating", "user_name", "min_price", "max_price", "review_count", "project_count")
+
+# Массовый импорт компаний с услугами и проектами из NDJSON (одна компания в строке)
+@router.post("/import", response_model=dict)
+@role_required(["admin", "company"])
+async def import_companies_ndjson(request: Request, batch_size: int = Query(100, ge=1, le=1000), current_user: dict = Depends(get_current_user)):
+    return await import_companies(iter_lines(request.stream()), current_user, batch_size)
+
+async def iter_lines(chunks):
+    """Разбивает поток байтов на строки, не читая его целиком"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+async def import_companies(lines, current_user: dict, batch_size: int = 100):
+    """
+    Загружает компании пачками: каждая пачка в своей транзакции, каждая строка в точке сохранения,
+    поэтому ошибочная строка не отменяет остальные. В памяти держится только текущая пачка.
+    """
+    summary = {"imported": 0, "failed": 0, "errors": []}
+    batch = []
+
+    def fail(line_number, detail):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_IMPORT_ERRORS:
+            summary["errors"].append({"line": line_number, "detail": detail})
+
+    async def flush():
+        saved = []
+        async with database.transaction():
+            for line_number, company_data, owner in batch:
+                try:
+                    saved.append((await save_company(company_data, owner), owner["user_id"]))
+                except HTTPException as e:
+                    fail(line_number, e.detail)
+                except KeyError as e:
+                    fail(line_number, f"Отсутствует поле {e}")
+                except (ValueError, TypeError, PostgresError) as e:
+                    fail(line_number, str(e))
+        # Импорт только создает компании; владельцы кешируются после фиксации транзакции
+        for company_id, owner_id in saved:
+            company_owners.set(company_id, owner_id)
+            invalidate_company(company_id)
+        summary["imported"] += len(saved)
+        batch.clear()
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+
         try:
-            session.execute(stmt)
-        except IntegrityError:
-            raise HTTPException(status_code=400, detail="У данного организации уже есть услуга с наименованием " + service_data['name'])
+            company_data = json.loads(line)
+            if not isinstance(company_data, dict):
+                raise ValueError("Строка должна содержать объект компании")
+
+            for field in EXPORT_ONLY_FIELDS:
+                company_data.pop(field, None)
+            for field in ("services", "projects"):
+                if not isinstance(company_data.get(field) or [], list):
+                    raise ValueError(f"Поле {field} должно быть списком")
+            for item in (company_data.get("services") or []) + (company_data.get("projects") or []):
+                if isinstance(item, dict):
+                    item.pop("id", None)
+
+            # Администратор может загружать компании от имени других пользователей
+            owner = current_user
+            if "user_id" in company_data:
+                user_id = company_data.pop("user_id")
+                if current_user["role"] == "admin":
+                    owner = {"user_id": user_id, "role": "admin"}
+                elif user_id != current_user["user_id"]:
+                    raise ValueError("Указывать другого владельца может только администратор")
+
+            validate_company_data(company_data)
+        except HTTPException as e:
+            fail(line_number, e.detail)
+            continue
+        except KeyError as e:
+            fail(line_number, f"Отсутствует поле {e}")
+            continue
+        except ValueError as e:
+            fail(line_number, str(e))
+            continue
+        except (TypeError, AttributeError) as e:
+            # Корректный JSON с полями не того типа (например, числовой email) — ошибка строки, а не 500
+            fail(line_number, f"Неверный тип поля: {e}")
+            continue
 
-    # Синхронизация проектов
-    existing_project_ids = set([p["id"] for p in projects_data if "id" in p])
-    existing_projects = session.execute(select(projects).where(projects.c.company_id == company_id)).fetchall()
+        batch.append((line_number, company_data, owner))
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+
+    return summary
+
+def check_unique_names(items: list, error: str):
+    """Проверяет, что в запросе нет двух элементов с одинаковым наименованием"""
+    names = set()
+    for item in items:
+        if item["name"] in names:
+            raise HTTPException(status_code=400, detail=error + item["name"])
+        names.add(item["name"])
+
+# Синхронизация услуг: по одному запросу на удаление, обновление и добавление.
+# Возвращает изменения счетчиков словаря названий услуг
+async def sync_services(company_id: int, services_data: list):
+    existing_services = [s for s in services_data if s.get("id")]
+    new_services = [s for s in services_data if not s.get("id")]
+    name_deltas = Counter()
+
+    # Удаляем услуги, которые больше не включены в запрос
+    deleted = await database.fetch_all(
+        "DELETE FROM services WHERE company_id = :company_id AND id <> ALL(CAST(:ids AS bigint[])) RETURNING name",
+        values={"company_id": company_id, "ids": [s["id"] for s in existing_services]}
+    )
+    name_deltas.subtract(row["name"] for row in deleted)
+
+    try:
+        # Обновляем существующие услуги
+        if existing_services:
+            renamed = await database.fetch_all(
+                """
+                UPDATE services SET name = v.name, price = v.price
+                FROM unnest(CAST(:ids AS bigint[]), CAST(:names AS varchar[]), CAST(:prices AS float8[])) AS v(id, name, price),
+                    services prev
+                WHERE services.id = v.id AND prev.id = v.id AND services.company_id = :company_id
+                RETURNING prev.name AS old_name, services.name AS new_name
+                """,
+                values={
+                    "company_id": company_id,
+                    "ids": [s["id"] for s in existing_services],
+                    "names": [s["name"] for s in existing_services],
+                    "prices": [float(s["price"]) for s in existing_services],
+                }
+            )
+            name_deltas.subtract(row["old_name"] for row in renamed)
+            name_deltas.update(row["new_name"] for row in renamed)
+
+        # Добавляем новые услуги
+        if new_services:
+            inserted = await database.fetch_all(
+                """
+                INSERT INTO services (name, price, company_id)
+                SELECT v.name, v.price, :company_id
+                FROM unnest(CAST(:names AS varchar[]), CAST(:prices AS float8[])) AS v(name, price)
+                ON CONFLICT (company_id, name) DO UPDATE SET price = EXCLUDED.price
+                RETURNING name, (xmax = 0) AS is_new
+                """,
+                values={
+                    "company_id": company_id,
+                    "names": [s["name"] for s in new_services],
+                    "prices": [float(s["price"]) for s in new_services],
+                }
+            )
+            name_deltas.update(row["name"] for row in inserted if row["is_new"])
+    except UniqueViolationError:
+        raise HTTPException(status_code=400, detail="У данного организации уже есть услуга с таким наименованием")
+
+    return name_deltas
+
+# Синхронизация проектов: по одному запросу на удаление, обновление и добавление
+async def sync_projects(company_id: int, projects_data: list):
+    existing_projects = [p for p in projects_data if p.get("id")]
+    new_projects = [p for p in projects_data if not p.get("id")]
 
     # Удаляем проекты, которые больше не включены в запрос
-    for project in existing_projects:
-        if project.id not in existing_project_ids:
-            stmt = delete(projects).where(projects.c.id == project.id)
-            session.execute(stmt)
-
-    # Добавляем/обновляем проекты
-    for project_data in projects_data:
-        if "id" in project_data:
-            stmt = update(projects).where(projects.c.id == project_data["id"]).values(project_data)
-        else:
-            project_data["company_id"] = company_id
-            stmt = insert(projects).values(project_data)
-        try:
-            session.execute(stmt)
-        except IntegrityError:
-            raise HTTPException(status_code=400, detail="У данного организации уже есть проект с названием " + project_data['name'])
-    
-    session.commit()
-    
-    return {"id": company_id, "message": "Компания успешно " + ("обновлена" if company_data.get("id") else "добавлена")}
+    await database.execute(
+        "DELETE FROM projects WHERE company_id = :company_id AND id <> ALL(CAST(:ids AS bigint[]))",
+        values={"company_id": company_id, "ids": [p["id"] for p in existing_projects]}
+    )
+
+    try:
+        # Обновляем существующие проекты
+        if existing_projects:
+            await database.execute(
+                """
+                UPDATE projects SET name = v.name, description = v.description
+                FROM unnest(CAST(:ids AS bigint[]), CAST(:names AS varchar[]), CAST(:descriptions AS text[])) AS v(id, name, description)
+                WHERE projects.id = v.id AND projects.company_id = :company_id
+                """,
+                values={
+                    "company_id": company_id,
+                    "ids": [p["id"] for p in existing_projects],
+                    "names": [p["name"] for p in existing_projects],
+                    "descriptions": [p.get("description") for p in existing_projects],
+                }
+            )
+
+        # Добавляем новые проекты
+        if new_projects:
+            await database.execute(
+                """
+                INSERT INTO projects (name, description, company_id)
+                SELECT v.name, v.description, :company_id
+                FROM unnest(CAST(:names AS varchar[]), CAST(:descriptions AS text[])) AS v(name, description)
+                ON CONFLICT (company_id, name) DO UPDATE SET description = EXCLUDED.description
+                """,
+                values={
+                    "company_id": company_id,
+                    "names": [p["name"] for p in new_projects],
+                    "descriptions": [p.get("description") for p in new_projects],
+                }
+            )
+    except UniqueViolationError:
+        raise HTTPException(status_code=400, detail="У данного организации уже есть проект с таким наименованием")
 
 @router.get("/", response_model=list[CompanyListModel])
-async def get_companies(current_user: dict = Depends(get_current_user),
+async def get_companies(request: Request, current_user: dict = Depends(get_current_user),
     service_name: List[str] = Query(None),  # Фильтр по названию услуги
     company_name: str = None,  # Фильтр по названию компании
+    q: str = None,             # Поиск по названию, описанию, услугам и проектам
     min_price: float = None,  # Минимальная стоимость услуги
     max_price: float = None,  # Максимальная стоимость услуги
     min_projects: int = None, # Минимальное количество проектов
     min_rating: int = None, # Минимальное количество проектов
     limit: int = 10,          # Количество компаний на странице (пагинация)
     offset: int = 0,          # Смещение для пагинации
+    cursor: str = None,       # Курсор keyset-пагинации из заголовка X-Next-Cursor
 ):
+    # Нормализованный набор фильтров: одинаковые по смыслу запросы дают один ключ кеша
+    filters = (
+        tuple(sorted(set(service_name))) if service_name else (),
+        company_name or None,
+        q.strip() if q and q.strip() else None,
+        None if min_price is None else float(min_price),
+        None if max_price is None else float(max_price),
+        min_projects,
+        min_rating or None,
+        limit,
+        None if cursor else offset,
+        cursor or None,
+    )
+
+    # ETag вычисляется до чтения: если каталог изменится во время запроса, клиент просто получит его заново
+    etag = catalog_etag()
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    # Версия каталога входит в ключ, поэтому после любой записи старые результаты просто не находятся
+    # В кеше лежит уже сериализованное тело ответа: повторный запрос не тратит время на JSON
+    cache_key = (catalog_version(), filters)
+    cached = catalog_cache.get(cache_key)
+    if cached is None:
+        result, next_cursor = await find_companies(*filters)
+        cached = (dumps(result), next_cursor)
+        catalog_cache.set(cache_key, cached, size=len(cached[0]))
+
+    body, next_cursor = cached
+    return FastJSONResponse(body, headers=etag_headers(etag, {"X-Next-Cursor": next_cursor} if next_cursor else None))
+
+def catalog_query(service_name, company_name, q, min_price, max_price, min_projects, min_rating, limit, offset, cursor):
+    """Строит запрос каталога по фильтрам (используется и для разбора планов в benchmarks/explain_queries.py)"""
     # Подзапрос для фильтрации компаний по услугам
     service_filter = select(services.c.company_id).distinct()
     if service_name:
@@ -127,89 +369,236 @@ async def get_companies(current_user: dict = Depends(get_current_user),
     if max_price is not None:
         service_filter = service_filter.where(services.c.price <= max_price)
 
-    # Основной запрос для компаний
+    # Основной запрос для компаний: сводка company_stats вместо агрегации по услугам, проектам и отзывам
     query = (
         select(
             companies.c.id,
             companies.c.name,
-            companies.c.rating,
+            company_stats.c.rating,
             companies.c.description,
             companies.c.site,
-            func.min(services.c.price).label("min_price"),
-            func.max(services.c.price).label("max_price"),
-            func.count(reviews.c.id.distinct()).label("review_count"),
-            func.count(projects.c.id.distinct()).label("project_count"),
+            company_stats.c.min_price,
+            company_stats.c.max_price,
+            company_stats.c.review_count,
+            company_stats.c.project_count,
             users.c.name.label('user_name')
         )
-        .join(services, services.c.company_id == companies.c.id, isouter=True)
-        .join(projects, projects.c.company_id == companies.c.id, isouter=True)
-        .join(reviews, reviews.c.company_id == companies.c.id, isouter=True)
+        .select_from(company_stats)
+        .join(companies, companies.c.id == company_stats.c.company_id)
         .join(users, users.c.id == companies.c.user_id)
-        .group_by(companies.c.id, users.c.name)
-        .order_by(companies.c.rating.desc())
+        .order_by(company_stats.c.rating.desc(), company_stats.c.company_id.desc())
     )
 
     # Применение фильтров
     if service_name or min_price is not None or max_price is not None:
         query = query.where(companies.c.id.in_(service_filter))
     if company_name:
-        query = query.where(companies.c.name.ilike(f"%{company_name}%"))
+        query = query.where(company_stats.c.search_name.ilike(f"%{company_name}%"))
     if min_rating:
-        query = query.where(companies.c.rating >= min_rating)
+        query = query.where(company_stats.c.rating >= min_rating)
     if min_projects is not None:
-        query = query.having(func.count(projects.c.id) >= min_projects)
+        query = query.where(company_stats.c.project_count >= min_projects)
 
-    # Пагинация
-    query = query.limit(limit).offset(offset)
+    # Поиск: совпадение по полнотекстовому индексу или нечеткое по названию, сортировка по релевантности
+    if q:
+        ts_query = func.websearch_to_tsquery(literal_column("'russian'::regconfig"), q)
+        query = query.where(or_(
+            company_stats.c.search_vector.op('@@')(ts_query),
+            literal(q).op('<%')(company_stats.c.search_name)
+        ))
+        rank = func.ts_rank_cd(company_stats.c.search_vector, ts_query) + func.word_similarity(q, company_stats.c.search_name)
+        query = query.order_by(None).order_by(rank.desc(), company_stats.c.rating.desc(), company_stats.c.company_id.desc())
 
-    # Выполнение запроса
-    result = await database.fetch_all(query)
+    # Пагинация: по курсору (rating, id) или, для совместимости, по смещению.
+    # Результаты поиска упорядочены по релевантности, для них только смещение
+    if cursor and q:
+        raise HTTPException(status_code=400, detail="Курсор не поддерживается вместе с поиском")
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            last_rating, last_id = Decimal(position[0]), int(position[1])
+        except (TypeError, ValueError, LookupError, ArithmeticError):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+        query = query.where(
+            tuple_(company_stats.c.rating, company_stats.c.company_id) < tuple_(last_rating, last_id)
+        )
+        query = query.limit(limit)
+    else:
+        query = query.limit(limit).offset(offset)
+
+    return query
+
+async def find_companies(service_name, company_name, q, min_price, max_price, min_projects, min_rating, limit, offset, cursor):
+    """Выполняет запрос каталога, возвращает (строки, курсор следующей страницы)"""
+    query = catalog_query(service_name, company_name, q, min_price, max_price, min_projects, min_rating, limit, offset, cursor)
+    result = [dict(row) for row in await database.fetch_all(query)]
+
+    # Курсор следующей страницы
+    next_cursor = None
+    if len(result) == limit and not q:
+        last = result[-1]
+        next_cursor = encode_cursor([str(last["rating"]), last["id"]])
 
     # Формирование ответа
-    return result
+    return result, next_cursor
+
+# Выгрузка каталога: строки читаются курсором на стороне сервера и сразу отправляются клиенту
+EXPORT_COLUMNS = ["id", "name", "rating", "description", "staff", "email", "inn", "phone_number", "site",
+    "user_id", "user_name", "min_price", "max_price", "review_count", "project_count", "services", "projects"]
+
+EXPORT_QUERY = """
+SELECT c.id, c.name, coalesce(cs.rating, 0) AS rating, c.description, c.staff, c.email, c.inn, c.phone_number, c.site,
+    c.user_id, u.name AS user_name, cs.min_price, cs.max_price, cs.review_count, cs.project_count,
+    coalesce((
+        SELECT json_agg(json_build_object('id', s.id, 'name', s.name, 'price', s.price) ORDER BY s.id)
+        FROM services s WHERE s.company_id = c.id
+    ), '[]') AS services,
+    coalesce((
+        SELECT json_agg(json_build_object('id', p.id, 'name', p.name, 'description', p.description) ORDER BY p.id)
+        FROM projects p WHERE p.company_id = c.id
+    ), '[]') AS projects
+FROM companies c
+JOIN users u ON u.id = c.user_id
+LEFT JOIN company_stats cs ON cs.company_id = c.id
+ORDER BY c.id
+"""
+
+# Для NDJSON строка JSON собирается в самой БД
+EXPORT_NDJSON_QUERY = "SELECT row_to_json(e)::text AS line FROM (" + EXPORT_QUERY + ") e"
+
+# Сколько строк копится перед отправкой очередного фрагмента ответа
+EXPORT_CHUNK_ROWS = 200
+
+@router.get("/export")
+async def export_companies(format: str = "ndjson", current_user: dict = Depends(get_current_user)):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Поддерживаются форматы ndjson и csv")
+    if format == "csv":
+        return StreamingResponse(export_csv(), media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="companies.csv"'})
+    return StreamingResponse(export_ndjson(), media_type="application/x-ndjson")
+
+async def export_ndjson():
+    chunk = []
+    first = True
+    async for row in database.iterate(EXPORT_NDJSON_QUERY):
+        chunk.append(row["line"])
+        # Первую строку отправляем сразу, дальше фрагментами
+        if first or len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield ("\n".join(chunk) + "\n").encode()
+            chunk.clear()
+            first = False
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode()
+
+async def export_csv():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+
+    rows = 0
+    buffer.seek(0)
+    buffer.truncate()
+    async for row in database.iterate(EXPORT_QUERY):
+        writer.writerow([row[column] for column in EXPORT_COLUMNS])
+        rows += 1
+        if rows % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
 
 @router.get("/{company_id}", response_model=dict)
-async def get_company(company_id: int, current_user: dict = Depends(get_current_user)):
-    query = (
-        companies
-            .join(users, users.c.id == companies.c.user_id)
-            .join(services, services.c.company_id == company_id, isouter=True)
-            .select()
-            .where(companies.c.id == company_id)
-            .with_only_columns(
-                companies, 
-                users.c.name.label("user_name"),
-                func.min(services.c.price).label("min_price"),
-                func.max(services.c.price).label("max_price")  
-            )
-            .group_by(companies.c.id, users.c.id)  # Группировка по компании и пользователю
-    )
+async def get_company(company_id: int, request: Request, current_user: dict = Depends(get_current_user)):
+    etag = company_etag(company_id)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
 
-    # Выполнение запроса
-    result = await database.fetch_one(query)
+    body = company_cache.get(company_id)
+    if body is not None:
+        return FastJSONResponse(body, headers=etag_headers(etag))
 
-    if not result:
+    version = company_version(company_id)
+    company = await fetch_company_detail(company_id)
+
+    if not company:
         raise HTTPException(status_code=404, detail="Организация не найдена")
 
-    return {'id': result.id,
-        'name' : result.name,
-        'rating' : result.rating,
-        'description' : result.description,
-        'staff' : result.staff,
-        'email' :result.email,
-        'inn' : result.inn,
-        'phone_number' : result.phone_number,
-        'user_id' : result.user_id,
-        'user_name' : result.user_name,
-        'min_price' :result.min_price,
-        'max_price' : result.max_price,
-        'site' : result.site,
-        'services' : list(map(lambda x: ServiceModel(**x), await database.fetch_all(services.select().where(services.c.company_id == company_id)))),
-        'projects' : list(map(lambda x: ProjectModel(**x), await database.fetch_all(projects.select().where(projects.c.company_id == company_id)))),
-        'reviews' : list(map(lambda x: ReviewModel(**x), await database.fetch_all(reviews.join(users, reviews.c.user_id == users.c.id)
-            .select()
-            .where(reviews.c.company_id == company_id)
-            .with_only_columns(reviews, users.c.name.label("user_name")))))
+    # Если компанию изменили, пока шел запрос, прочитанные данные могут быть устаревшими
+    body = dumps(company)
+    if version == company_version(company_id):
+        company_cache.set(company_id, body, size=len(body))
+
+    return FastJSONResponse(body, headers=etag_headers(etag))
+
+# Сколько последних отзывов включается в карточку компании, остальные — через /reviews
+DETAIL_REVIEWS_LIMIT = 10
+
+# Карточка компании целиком: услуги, проекты и последние отзывы собираются в JSON подзапросами
+COMPANY_DETAIL_QUERY = """
+SELECT c.id, c.name, coalesce(cs.rating, 0) AS rating, c.description, c.staff, c.email, c.inn, c.phone_number, c.user_id, c.site,
+    u.name AS user_name, cs.min_price, cs.max_price,
+    coalesce((
+        SELECT json_agg(json_build_object('id', s.id, 'name', s.name, 'price', s.price) ORDER BY s.id)
+        FROM services s WHERE s.company_id = c.id
+    ), '[]') AS services,
+    coalesce((
+        SELECT json_agg(json_build_object('id', p.id, 'name', p.name, 'description', p.description) ORDER BY p.id)
+        FROM projects p WHERE p.company_id = c.id
+    ), '[]') AS projects,
+    coalesce((
+        SELECT json_agg(json_build_object('id', r.id, 'content', r.content, 'rating', r.rating,
+            'company_id', r.company_id, 'user_id', r.user_id, 'user_name', r.user_name) ORDER BY r.id DESC)
+        FROM (
+            SELECT r.*, ru.name AS user_name
+            FROM reviews r JOIN users ru ON ru.id = r.user_id
+            WHERE r.company_id = c.id
+            ORDER BY r.id DESC
+            LIMIT :reviews_limit
+        ) r
+    ), '[]') AS reviews,
+    coalesce(cs.review_count, 0) AS review_count
+FROM companies c
+JOIN users u ON u.id = c.user_id
+LEFT JOIN company_stats cs ON cs.company_id = c.id
+WHERE c.id = :company_id
+"""
+
+async def fetch_company_detail(company_id: int):
+    """Возвращает карточку компании за один запрос к БД или None"""
+    result = await database.fetch_one(COMPANY_DETAIL_QUERY, values={"company_id": company_id, "reviews_limit": DETAIL_REVIEWS_LIMIT})
+
+    if not result:
+        return None
+
+    company_reviews = loads(result['reviews'])
+    # Курсор для продолжения списка через /reviews, если в карточку вошли не все отзывы
+    reviews_cursor = None
+    if len(company_reviews) == DETAIL_REVIEWS_LIMIT:
+        reviews_cursor = encode_cursor([company_reviews[-1]['id']])
+
+    return {'id': result['id'],
+        'name' : result['name'],
+        'rating' : result['rating'],
+        'description' : result['description'],
+        'staff' : result['staff'],
+        'email' :result['email'],
+        'inn' : result['inn'],
+        'phone_number' : result['phone_number'],
+        'user_id' : result['user_id'],
+        'user_name' : result['user_name'],
+        'min_price' :result['min_price'],
+        'max_price' : result['max_price'],
+        'site' : result['site'],
+        # Вложенные списки уже собраны в JSON базой в нужном виде, модели для них не строятся
+        'services' : loads(result['services']),
+        'projects' : loads(result['projects']),
+        'reviews' : company_reviews,
+        'reviews_cursor' : reviews_cursor,
+        'review_count' : result['review_count']
     }
 
 @router.delete("/{company_id}")
@@ -219,9 +608,14 @@ async def delete_company(company_id: int, current_user: dict = Depends(get_curre
     if not company:
         raise HTTPException(status_code=404, detail="Организация не найдена")
 
-    # Удаление компании
+    # Удаление компании, услуги удаляются явно, чтобы уменьшить счетчики словаря названий
     query = companies.delete().where(companies.c.id == company_id)
-    await database.execute(query)
+    async with database.transaction():
+        deleted = await database.fetch_all(services.delete().where(services.c.company_id == company_id).returning(services.c.name))
+        await database.execute(query)
+        await update_service_names({row["name"]: -1 for row in deleted})
+    company_owners.invalidate(company_id)
+    invalidate_company(company_id)
     return {"detail": "Организация удалена"}
 
 def validate_company_data(company_data):
@@ -1,12 +1,16 @@
-from fastapi import Depends, HTTPException, status, APIRouter
+from fastapi import Depends, HTTPException, status, APIRouter, Body, Request
 from sqlalchemy import select, func
-from asyncpg.exceptions import UniqueViolationError
+from asyncpg.exceptions import UniqueViolationError, ForeignKeyViolationError
 from database import database
 from models import companies, projects
-from schemas import ProjectCreate, ProjectUpdate, ProjectModel
+from schemas import ProjectCreate, ProjectUpdate, ProjectModel, ProjectBatchUpdate
 from utils import get_current_user
 from typing import List
 from decorators import is_company_owner
+from api.batch import check_batch_size, split_duplicates, created_results, updated_results, deleted_results
+from stats import refresh_company_stats
+from cache import invalidate_company, company_etag
+from responses import FastJSONResponse, etag_headers, not_modified
 
 router = APIRouter()
 
@@ -17,12 +21,110 @@ async def create_project(company_id: int, project: ProjectCreate, current_user:
     query = projects.insert().values(name=project.name, description=project.description, company_id=company_id)
 
     try:
-        project_id = await database.execute(query)
+        async with database.transaction():
+            project_id = await database.execute(query)
+            await refresh_company_stats(company_id)
     except UniqueViolationError:
         raise HTTPException(status_code=400, detail="У данной организации уже есть проект с таким наименованием")
+    except ForeignKeyViolationError:
+        raise HTTPException(status_code=404, detail="Компания не найдена")
+
+    invalidate_company(company_id)
 
     return {"id": project_id, "message": "Проект успешно добавлен"}
 
+# Пакетное добавление проектов: один запрос, по результату на каждый элемент
+@router.post("/batch", response_model=List[dict])
+@is_company_owner()
+async def create_projects_batch(company_id: int, items: List[ProjectCreate], current_user: dict = Depends(get_current_user)):
+    check_batch_size(items)
+    if not items:
+        return []
+
+    try:
+        async with database.transaction():
+            rows = await database.fetch_all(
+                """
+                INSERT INTO projects (name, description, company_id)
+                SELECT v.name, v.description, :company_id
+                FROM unnest(CAST(:names AS varchar[]), CAST(:descriptions AS text[])) AS v(name, description)
+                ON CONFLICT (company_id, name) DO NOTHING
+                RETURNING id, name
+                """,
+                values={"company_id": company_id, "names": [i.name for i in items], "descriptions": [i.description for i in items]}
+            )
+            created = {row["name"]: row["id"] for row in rows}
+            await refresh_company_stats(company_id)
+    except ForeignKeyViolationError:
+        raise HTTPException(status_code=404, detail="Компания не найдена")
+
+    invalidate_company(company_id)
+
+    return created_results(items, created, "У данной организации уже есть проект с таким наименованием")
+
+# Пакетное изменение проектов
+@router.put("/batch", response_model=List[dict])
+@is_company_owner()
+async def update_projects_batch(company_id: int, items: List[ProjectBatchUpdate], current_user: dict = Depends(get_current_user)):
+    check_batch_size(items)
+    if not items:
+        return []
+
+    batch, duplicates = split_duplicates(items)
+
+    try:
+        async with database.transaction():
+            found = {row["id"] for row in await database.fetch_all(
+                "SELECT id FROM projects WHERE company_id = :company_id AND id = ANY(CAST(:ids AS bigint[]))",
+                values={"company_id": company_id, "ids": [i.id for i in batch]}
+            )}
+            rows = await database.fetch_all(
+                """
+                UPDATE projects SET name = v.name, description = v.description
+                FROM unnest(CAST(:ids AS bigint[]), CAST(:names AS varchar[]), CAST(:descriptions AS text[])) AS v(id, name, description)
+                WHERE projects.id = v.id AND projects.company_id = :company_id
+                    AND NOT EXISTS (
+                        SELECT 1 FROM projects other
+                        WHERE other.company_id = :company_id AND other.name = v.name AND other.id <> v.id
+                    )
+                RETURNING projects.id
+                """,
+                values={
+                    "company_id": company_id,
+                    "ids": [i.id for i in batch],
+                    "names": [i.name for i in batch],
+                    "descriptions": [i.description for i in batch],
+                }
+            )
+            updated = {row["id"] for row in rows}
+            # Названия проектов входят в поисковый вектор сводки
+            await refresh_company_stats(company_id)
+    except UniqueViolationError:
+        raise HTTPException(status_code=400, detail="У данного организации уже есть проект с таким наименованием")
+
+    invalidate_company(company_id)
+
+    return updated_results(items, updated, found, duplicates, "У данной организации уже есть проект с таким наименованием", "Проект не найден")
+
+# Пакетное удаление проектов
+@router.delete("/batch", response_model=List[dict])
+@is_company_owner()
+async def delete_projects_batch(company_id: int, ids: List[int] = Body(...), current_user: dict = Depends(get_current_user)):
+    check_batch_size(ids)
+    if not ids:
+        return []
+
+    async with database.transaction():
+        rows = await database.fetch_all(
+            "DELETE FROM projects WHERE company_id = :company_id AND id = ANY(CAST(:ids AS bigint[])) RETURNING id",
+            values={"company_id": company_id, "ids": ids}
+        )
+        await refresh_company_stats(company_id)
+
+    invalidate_company(company_id)
+
+    return deleted_results(ids, {row["id"] for row in rows}, "Проект не найден")
+
 @router.put("/{project_id}", response_model=ProjectModel)
 @is_company_owner()
 async def update_project(
@@ -39,19 +141,30 @@ async def update_project(
     query = projects.update().where(projects.c.id == project_id).values(**project_data.dict(exclude_unset=True))
 
     try:
-        await database.execute(query)
+        async with database.transaction():
+            await database.execute(query)
+            # Названия проектов входят в поисковый вектор сводки
+            await refresh_company_stats(company_id)
     except UniqueViolationError:
         raise HTTPException(status_code=400, detail="У данного организации уже есть проект с таким наименованием")
 
+    invalidate_company(company_id)
+
     # Возвращаем обновленные данные  
     updated_project = await database.fetch_one(projects.select().where(projects.c.id == project_id))
     return updated_project
 
 # Получение всех отзывов о компании
 @router.get("/", response_model=List[ProjectModel])
-async def get_projects(company_id: int, current_user: dict = Depends(get_current_user),):
-    query = projects.select().where(projects.c.company_id == company_id)
-    return await database.fetch_all(query)
+async def get_projects(company_id: int, request: Request, current_user: dict = Depends(get_current_user),):
+    etag = company_etag(company_id)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    # Только поля ProjectModel: строки отдаются без проверки моделью
+    query = select(projects.c.id, projects.c.name, projects.c.description).where(projects.c.company_id == company_id)
+    return FastJSONResponse([dict(row) for row in await database.fetch_all(query)], headers=etag_headers(etag))
 
 @router.delete("/{project_id}")
 @is_company_owner()
@@ -62,5 +175,8 @@ async def delete_project(company_id: int, project_id: int, current_user: dict =
 
     # Удаление Проекта
     query = projects.delete().where(projects.c.id == project_id)
-    await database.execute(query)
+    async with database.transaction():
+        await database.execute(query)
+        await refresh_company_stats(company_id)
+    invalidate_company(company_id)
     return {"detail": "Проект удален"}
\ No newline at end of file
@@ -1,12 +1,14 @@
-from fastapi import Depends, HTTPException, status, APIRouter
-from sqlalchemy import select, func
+from fastapi import Depends, HTTPException, status, APIRouter, Query, Request
 from asyncpg.exceptions import UniqueViolationError
 from database import database
-from models import companies, reviews, users
+from models import reviews, users
 from schemas import ReviewCreate, ReviewUpdate, ReviewModel
-from utils import get_current_user
+from utils import get_current_user, encode_cursor, decode_cursor
 from typing import List
 from decorators import role_required
+from stats import RATING_DELTA_CTE
+from cache import invalidate_company, company_etag
+from responses import FastJSONResponse, etag_headers, not_modified
 
 router = APIRouter()
 
@@ -17,19 +19,29 @@ async def create_review(company_id: int, review: ReviewCreate, current_user: dic
     if not 1 <= review.rating <= 5:
         raise HTTPException(status_code=400, detail="Рейтинг может принимать значения от 1 до 5")
 
-    query = reviews.insert().values(
-        content=review.content,
-        rating=review.rating,
-        company_id=company_id,
-        user_id=current_user["user_id"],
-    )
+    # Отзыв и рейтинг компании меняются одним запросом
+    query = """
+    WITH review AS (
+        INSERT INTO reviews (content, rating, company_id, user_id)
+        VALUES (:content, :rating, :company_id, :user_id)
+        RETURNING id, rating
+    ), delta AS (
+        SELECT 1 AS count_delta, rating AS sum_delta FROM review
+    ), """ + RATING_DELTA_CTE + """
+    SELECT id FROM review
+    """
 
     try:
-        review_id = await database.execute(query)
+        review_id = await database.fetch_val(query, values={
+            "content": review.content,
+            "rating": review.rating,
+            "company_id": company_id,
+            "user_id": current_user["user_id"],
+        })
     except UniqueViolationError:
         raise HTTPException(status_code=400, detail="Отзыв уже был добавлен")
 
-    await update_company_rating(company_id)
+    invalidate_company(company_id)
 
     return {"id": review_id, "message": "Отзыв успешно добавлен"}
 
@@ -41,18 +53,38 @@ async def update_review(
     review_data: ReviewUpdate, 
     current_user: dict = Depends(get_current_user)
 ):
-    # Проверка существования отзыва
-    review = await database.fetch_one(reviews.select().where(reviews.c.id == review_id).where(reviews.c.company_id == company_id))
-    if not review:
-        raise HTTPException(status_code=404, detail="Отзыв не найден")
-    if current_user["role"] != "admin" and review["user_id"] != current_user["user_id"]:
-        raise HTTPException(status_code=403, detail="У вас нет прав редактировать данный отзыв")
-
-    # Обновление отзыва
-    query = reviews.update().where(reviews.c.id == review_id).values(**review_data.dict(exclude_unset=True))
-    await database.execute(query)
-
-    await update_company_rating(company_id)
+    if not 1 <= review_data.rating <= 5:
+        raise HTTPException(status_code=400, detail="Рейтинг может принимать значения от 1 до 5")
+    if review_data.rating != int(review_data.rating):
+        raise HTTPException(status_code=400, detail="Рейтинг должен быть целым числом")
+
+    async with database.transaction():
+        # Проверка существования отзыва, строка блокируется до конца транзакции
+        review = await database.fetch_one(reviews.select().where(reviews.c.id == review_id).where(reviews.c.company_id == company_id).with_for_update())
+        if not review:
+            raise HTTPException(status_code=404, detail="Отзыв не найден")
+        if current_user["role"] != "admin" and review["user_id"] != current_user["user_id"]:
+            raise HTTPException(status_code=403, detail="У вас нет прав редактировать данный отзыв")
+
+        # Обновление отзыва и рейтинга компании на разницу оценок
+        rating = int(review_data.rating)
+        query = """
+        WITH review AS (
+            UPDATE reviews SET content = :content, rating = :rating WHERE id = :review_id RETURNING id
+        ), delta AS (
+            SELECT 0 AS count_delta, CAST(:sum_delta AS int8) AS sum_delta FROM review
+        ), """ + RATING_DELTA_CTE + """
+        SELECT id FROM review
+        """
+        await database.execute(query, values={
+            "content": review_data.content,
+            "rating": rating,
+            "review_id": review_id,
+            "company_id": company_id,
+            "sum_delta": rating - review["rating"],
+        })
+
+    invalidate_company(company_id)
 
     # Возвращаем обновленные данные отзыва
     updated_review = await database.fetch_one(reviews.join(users, reviews.c.user_id == users.c.id)
@@ -62,17 +94,47 @@ async def update_review(
 
     return updated_review
 
-# Получение всех отзывов о компании
+# Получение отзывов о компании, новые первыми, постранично по курсору
 @router.get("/", response_model=List[ReviewModel])
-async def get_reviews(company_id: int, current_user: dict = Depends(get_current_user)):
+async def get_reviews(
+    company_id: int,
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = None,  # Курсор из заголовка X-Next-Cursor предыдущей страницы
+    user_id: int = None,  # Только отзыв указанного пользователя (свой отзыв может быть далеко в списке)
+    current_user: dict = Depends(get_current_user)
+):
+    etag = company_etag(company_id)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
     query = (
         reviews.join(users, reviews.c.user_id == users.c.id)
             .select()
             .where(reviews.c.company_id == company_id)
             .with_only_columns(reviews, users.c.name.label("user_name")) 
+            .order_by(reviews.c.id.desc())
+            .limit(limit)
     )
 
-    return await database.fetch_all(query)
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            last_id = int(position[0])
+        except (TypeError, ValueError, LookupError):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+        query = query.where(reviews.c.id < last_id)
+    if user_id is not None:
+        query = query.where(reviews.c.user_id == user_id)
+
+    result = [dict(row) for row in await database.fetch_all(query)]
+
+    headers = None
+    if len(result) == limit:
+        headers = {"X-Next-Cursor": encode_cursor([result[-1]["id"]])}
+
+    return FastJSONResponse(result, headers=etag_headers(etag, headers))
 
 @router.delete("/{review_id}")
 @role_required(["user", "admin"])
@@ -83,17 +145,16 @@ async def delete_review(company_id: int, review_id: int, current_user: dict = De
     if current_user["role"] != "admin" and review["user_id"] != current_user["user_id"]:
         raise HTTPException(status_code=403, detail="У вас нет прав для удаления данного отзыва")
 
-    # Удаление отзыва
-    query = reviews.delete().where(reviews.c.id == review_id)
-    await database.execute(query)
-
-    await update_company_rating(company_id)
-
-    return {"detail": "Отзыв удален"}
-
-# Пересчет рейтинга компании
-async def update_company_rating(company_id):
-    avg_rating_query = select(func.coalesce(func.avg(reviews.c.rating), 0)).where(reviews.c.company_id == company_id)
-    avg_rating = await database.fetch_one(avg_rating_query)
-    update_rating_query = companies.update().where(companies.c.id == company_id).values(rating=avg_rating[0])
-    await database.execute(update_rating_query)
\ No newline at end of file
+    # Удаление отзыва и вычитание его оценки из рейтинга компании
+    query = """
+    WITH review AS (
+        DELETE FROM reviews WHERE id = :review_id RETURNING id, rating
+    ), delta AS (
+        SELECT -1 AS count_delta, -rating AS sum_delta FROM review
+    ), """ + RATING_DELTA_CTE + """
+    SELECT id FROM review
+    """
+    await database.execute(query, values={"review_id": review_id, "company_id": company_id})
+    invalidate_company(company_id)
+
+    return {"detail": "Отзыв удален"}
\ No newline at end of file
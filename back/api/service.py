@@ -1,12 +1,17 @@
-from fastapi import Depends, HTTPException, status, APIRouter
+from fastapi import Depends, HTTPException, status, APIRouter, Body, Request
 from sqlalchemy import select
 from asyncpg.exceptions import UniqueViolationError, ForeignKeyViolationError
 from database import database
 from models import companies, services
-from schemas import ServiceCreate, ServiceUpdate, ServiceModel
+from schemas import ServiceCreate, ServiceUpdate, ServiceModel, ServiceBatchUpdate
+from collections import Counter
 from utils import get_current_user
 from typing import List
 from decorators import is_company_owner
+from api.batch import check_batch_size, split_duplicates, created_results, updated_results, deleted_results
+from stats import refresh_company_stats, update_service_names
+from cache import invalidate_company, company_etag
+from responses import FastJSONResponse, etag_headers, not_modified
 
 router = APIRouter()
 
@@ -17,14 +22,116 @@ async def create_service(company_id: int, service: ServiceCreate, current_user:
     query = services.insert().values(name=service.name, price=service.price, company_id=company_id)
 
     try:
-        service_id = await database.execute(query)
+        async with database.transaction():
+            service_id = await database.execute(query)
+            await refresh_company_stats(company_id)
+            await update_service_names({service.name: 1})
     except ForeignKeyViolationError:
         raise HTTPException(status_code=404, detail="Компания не найдена")
     except UniqueViolationError:
         raise HTTPException(status_code=400, detail="У данной организации уже есть услуга с таким наименованием")
 
+    invalidate_company(company_id)
+
     return {"id": service_id, "message": "Услуга успешно добавлена"}
 
+# Пакетное добавление услуг: один запрос, по результату на каждый элемент
+@router.post("/batch", response_model=List[dict])
+@is_company_owner()
+async def create_services_batch(company_id: int, items: List[ServiceCreate], current_user: dict = Depends(get_current_user)):
+    check_batch_size(items)
+    if not items:
+        return []
+
+    try:
+        async with database.transaction():
+            rows = await database.fetch_all(
+                """
+                INSERT INTO services (name, price, company_id)
+                SELECT v.name, v.price, :company_id
+                FROM unnest(CAST(:names AS varchar[]), CAST(:prices AS float8[])) AS v(name, price)
+                ON CONFLICT (company_id, name) DO NOTHING
+                RETURNING id, name
+                """,
+                values={"company_id": company_id, "names": [i.name for i in items], "prices": [i.price for i in items]}
+            )
+            created = {row["name"]: row["id"] for row in rows}
+            await refresh_company_stats(company_id)
+            await update_service_names({name: 1 for name in created})
+    except ForeignKeyViolationError:
+        raise HTTPException(status_code=404, detail="Компания не найдена")
+
+    invalidate_company(company_id)
+
+    return created_results(items, created, "У данной организации уже есть услуга с таким наименованием")
+
+# Пакетное изменение услуг
+@router.put("/batch", response_model=List[dict])
+@is_company_owner()
+async def update_services_batch(company_id: int, items: List[ServiceBatchUpdate], current_user: dict = Depends(get_current_user)):
+    check_batch_size(items)
+    if not items:
+        return []
+
+    batch, duplicates = split_duplicates(items)
+
+    try:
+        async with database.transaction():
+            found = {row["id"] for row in await database.fetch_all(
+                "SELECT id FROM services WHERE company_id = :company_id AND id = ANY(CAST(:ids AS bigint[]))",
+                values={"company_id": company_id, "ids": [i.id for i in batch]}
+            )}
+            rows = await database.fetch_all(
+                """
+                UPDATE services SET name = v.name, price = v.price
+                FROM unnest(CAST(:ids AS bigint[]), CAST(:names AS varchar[]), CAST(:prices AS float8[])) AS v(id, name, price),
+                    services prev
+                WHERE services.id = v.id AND prev.id = v.id AND services.company_id = :company_id
+                    AND NOT EXISTS (
+                        SELECT 1 FROM services other
+                        WHERE other.company_id = :company_id AND other.name = v.name AND other.id <> v.id
+                    )
+                RETURNING services.id, prev.name AS old_name, services.name AS new_name
+                """,
+                values={
+                    "company_id": company_id,
+                    "ids": [i.id for i in batch],
+                    "names": [i.name for i in batch],
+                    "prices": [i.price for i in batch],
+                }
+            )
+            updated = {row["id"] for row in rows}
+            name_deltas = Counter(row["new_name"] for row in rows)
+            name_deltas.subtract(row["old_name"] for row in rows)
+            await refresh_company_stats(company_id)
+            await update_service_names(name_deltas)
+    except UniqueViolationError:
+        raise HTTPException(status_code=400, detail="У данного организации уже есть услуга с таким наименованием")
+
+    invalidate_company(company_id)
+
+    return updated_results(items, updated, found, duplicates, "У данного организации уже есть услуга с таким наименованием", "Услуга не найдена")
+
+# Пакетное удаление услуг
+@router.delete("/batch", response_model=List[dict])
+@is_company_owner()
+async def delete_services_batch(company_id: int, ids: List[int] = Body(...), current_user: dict = Depends(get_current_user)):
+    check_batch_size(ids)
+    if not ids:
+        return []
+
+    async with database.transaction():
+        rows = await database.fetch_all(
+            "DELETE FROM services WHERE company_id = :company_id AND id = ANY(CAST(:ids AS bigint[])) RETURNING id, name",
+            values={"company_id": company_id, "ids": ids}
+        )
+        await refresh_company_stats(company_id)
+        await update_service_names({row["name"]: -1 for row in rows})
+
+    invalidate_company(company_id)
+
+    return deleted_results(ids, {row["id"] for row in rows}, "Услуга не найдена")
+
 @router.put("/{service_id}", response_model=ServiceModel)
 @is_company_owner()
 async def update_service(
@@ -41,18 +148,30 @@ async def update_service(
     query = services.update().where(services.c.id == service_id).values(**service_data.dict(exclude_unset=True))
 
     try:
-        await database.execute(query)
+        async with database.transaction():
+            await database.execute(query)
+            await refresh_company_stats(company_id)
+            if service_data.name != service["name"]:
+                await update_service_names({service["name"]: -1, service_data.name: 1})
     except UniqueViolationError:
         raise HTTPException(status_code=400, detail="У данного организации уже есть услуга с таким наименованием")
 
+    invalidate_company(company_id)
+
     # Возвращаем обновленные данные  
     updated_service = await database.fetch_one(services.select().where(services.c.id == service_id))
     return updated_service
 
 @router.get("/", response_model=list[ServiceModel])
-async def get_services(company_id: int, current_user: dict = Depends(get_current_user)):
-    query = services.select().where(services.c.company_id == company_id)
-    return await database.fetch_all(query)
+async def get_services(company_id: int, request: Request, current_user: dict = Depends(get_current_user)):
+    etag = company_etag(company_id)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    # Только поля ServiceModel: строки отдаются без проверки моделью
+    query = select(services.c.id, services.c.name, services.c.price).where(services.c.company_id == company_id)
+    return FastJSONResponse([dict(row) for row in await database.fetch_all(query)], headers=etag_headers(etag))
 
 @router.delete("/{service_id}")
 @is_company_owner()
@@ -63,5 +182,9 @@ async def delete_service(company_id: int, service_id: int, current_user: dict =
 
     # Удаление Услуги
     query = services.delete().where(services.c.id == service_id)
-    await database.execute(query)
+    async with database.transaction():
+        await database.execute(query)
+        await refresh_company_stats(company_id)
+        await update_service_names({service["name"]: -1})
+    invalidate_company(company_id)
     return {"detail": "Услуга удалена"}
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+Сборка и раздача статики.
+
+python assets.py собирает static/ в static_build/:
+- к именам файлов (кроме HTML) добавляется хеш содержимого: css/main.css -> css/main.3f2a9c1b.css;
+- ссылки в HTML, CSS и JS переписываются на новые имена;
+- для текстовых файлов рядом кладутся сжатые варианты .gz и, если установлен пакет brotli, .br;
+- соответствие имен записывается в manifest.json.
+
+AssetFiles раздает собранный каталог: файлы с хешем в имени кешируются браузером навсегда,
+HTML перепроверяется по ETag при каждом заходе. Если сборки нет, раздается исходный static/.
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import mimetypes
+import posixpath
+from fastapi.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, "static")
+BUILD_DIR = os.path.join(BASE_DIR, "static_build")
+MANIFEST = "manifest.json"
+URL_PREFIX = "/static/"
+
+COMPRESSIBLE = {".html", ".css", ".js", ".svg", ".json", ".txt"}
+# Сжатый вариант сохраняется, только если он заметно меньше исходного
+MIN_COMPRESSION_GAIN = 0.9
+# Порядок обработки: сначала файлы без ссылок, затем те, что на них ссылаются
+BUILD_ORDER = {".css": 1, ".js": 2, ".html": 3}
+
+# Ссылка в url(...) или в кавычках: атрибуты src/href, строки в JS
+REFERENCE = re.compile(r"""(?P<prefix>url\(\s*["']?|["'])(?P<ref>[^"'()\s?#]+)""")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def fingerprint(path: str, content: bytes):
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:8]}{ext}"
+
+def rewrite_references(text: str, base: str, manifest: dict):
+    """Заменяет ссылки на файлы из manifest их именами с хешем; base — каталог, от которого считаются относительные пути"""
+    def replace(match):
+        ref = match.group("ref")
+        if ref.startswith(URL_PREFIX):
+            path = ref[len(URL_PREFIX):]
+            hashed = manifest.get(path)
+            return match.group("prefix") + URL_PREFIX + hashed if hashed else match.group(0)
+        if "://" in ref or ref.startswith(("/", "data:")):
+            return match.group(0)
+        hashed = manifest.get(posixpath.normpath(posixpath.join(base, ref)))
+        if not hashed:
+            return match.group(0)
+        return match.group("prefix") + posixpath.relpath(hashed, base or ".")
+    return REFERENCE.sub(replace, text)
+
+def write_compressed(path: str, content: bytes):
+    variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(content, quality=11)
+    for suffix, data in variants.items():
+        if len(data) < len(content) * MIN_COMPRESSION_GAIN:
+            with open(path + suffix, "wb") as f:
+                f.write(data)
+
+def build(source: str = SOURCE_DIR, target: str = BUILD_DIR):
+    files = []
+    for root, _, names in os.walk(source):
+        for name in names:
+            files.append(posixpath.join(*os.path.relpath(os.path.join(root, name), source).split(os.sep)))
+    files.sort(key=lambda path: (BUILD_ORDER.get(posixpath.splitext(path)[1].lower(), 0), path))
+
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    manifest = {}
+    for path in files:
+        ext = posixpath.splitext(path)[1].lower()
+        with open(os.path.join(source, path), "rb") as f:
+            content = f.read()
+
+        if ext in BUILD_ORDER:
+            # HTML и JS выполняются в контексте страницы, их относительные ссылки считаются от корня static
+            base = posixpath.dirname(path) if ext == ".css" else ""
+            content = rewrite_references(content.decode("utf-8"), base, manifest).encode("utf-8")
+
+        # HTML открывается по постоянным адресам, поэтому имя не меняется
+        output = path if ext == ".html" else fingerprint(path, content)
+        if output != path:
+            manifest[path] = output
+
+        output_path = os.path.join(target, *output.split("/"))
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "wb") as f:
+            f.write(content)
+        if ext in COMPRESSIBLE:
+            write_compressed(output_path, content)
+
+    with open(os.path.join(target, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles с предварительно сжатыми вариантами и заголовками кеширования по manifest.json"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.immutable = set()
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.immutable = {
+                    os.path.realpath(os.path.join(self.directory, *path.split("/"))) for path in json.load(f).values()
+                }
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        full_path = os.path.realpath(full_path)
+        accepted = accepted_encodings(scope)
+        response = None
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding in accepted and os.path.isfile(full_path + suffix):
+                response = super().file_response(full_path + suffix, os.stat(full_path + suffix), scope, status_code)
+                response.headers["content-encoding"] = encoding
+                if response.status_code != 304:
+                    # Тип содержимого — от исходного файла, а не от .gz/.br
+                    response.headers["content-type"] = content_type(full_path)
+                break
+        if response is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+
+        response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = IMMUTABLE if full_path in self.immutable else REVALIDATE
+        return response
+
+def content_type(path: str):
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return media_type + "; charset=utf-8" if media_type.startswith("text/") else media_type
+
+def accepted_encodings(scope):
+    for name, value in scope["headers"]:
+        if name == b"accept-encoding":
+            return {part.split(";")[0].strip() for part in value.decode("latin-1").lower().split(",")}
+    return set()
+
+def static_files():
+    """Собранная статика, если она есть, иначе исходный каталог"""
+    if os.path.isfile(os.path.join(BUILD_DIR, MANIFEST)):
+        return AssetFiles(directory=BUILD_DIR)
+    return AssetFiles(directory=SOURCE_DIR)
+
+if __name__ == "__main__":
+    manifest = build(*sys.argv[1:3])
+    print(f"Собрано файлов с хешем: {len(manifest)}, сжатие brotli: {'да' if brotli else 'нет (пакет brotli не установлен)'}")
@@ -0,0 +1,42 @@
+"""
+Стоимость проверки токена: полный jwt.decode против кеша проверенных токенов
+(utils.get_current_user). БД не требуется.
+
+python -m benchmarks.bench_auth --iterations 20000
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+from jose import jwt
+from utils import create_access_token, get_current_user, token_cache, SECRET_KEY, ALGORITHM
+from benchmarks.common import summarize, print_report
+
+
+async def main(iterations: int):
+    token = create_access_token(data={"user_id": 1, "sub": "user", "role": "user",
+        "phone_number": "", "name": "Пользователь"}, expires_delta=timedelta(hours=1))
+
+    uncached = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        uncached.append(time.perf_counter() - started)
+
+    token_cache.clear()
+    await get_current_user(token)
+    cached = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await get_current_user(token)
+        cached.append(time.perf_counter() - started)
+
+    report = {"jwt_decode": summarize(uncached), "cached": summarize(cached), "cache": token_cache.stats()}
+    report["mean_speedup"] = round(report["jwt_decode"]["mean_ms"] / report["cached"]["mean_ms"], 1)
+    print_report(report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,76 @@
+"""
+Сравнение карточки компании: 4 последовательных запроса (старый вариант)
+против одного запроса с json_agg (fetch_company_detail).
+
+python -m benchmarks.bench_company_detail --iterations 200 --companies 20
+"""
+import argparse
+import asyncio
+from database import database
+from models import companies, services, projects, reviews, users
+from schemas import ServiceModel, ProjectModel, ReviewModel
+from sqlalchemy import func
+from api.company import fetch_company_detail
+from benchmarks.common import summarize, timed, print_report
+
+
+async def legacy_company_detail(company_id: int):
+    """Карточка компании в том виде, как она собиралась до объединения запросов"""
+    query = (
+        companies
+            .join(users, users.c.id == companies.c.user_id)
+            .join(services, services.c.company_id == company_id, isouter=True)
+            .select()
+            .where(companies.c.id == company_id)
+            .with_only_columns(
+                companies,
+                users.c.name.label("user_name"),
+                func.min(services.c.price).label("min_price"),
+                func.max(services.c.price).label("max_price")
+            )
+            .group_by(companies.c.id, users.c.id)
+    )
+    result = await database.fetch_one(query)
+    return {'id': result.id,
+        'services' : list(map(lambda x: ServiceModel(**x), await database.fetch_all(services.select().where(services.c.company_id == company_id)))),
+        'projects' : list(map(lambda x: ProjectModel(**x), await database.fetch_all(projects.select().where(projects.c.company_id == company_id)))),
+        'reviews' : list(map(lambda x: ReviewModel(**x), await database.fetch_all(reviews.join(users, reviews.c.user_id == users.c.id)
+            .select()
+            .where(reviews.c.company_id == company_id)
+            .with_only_columns(reviews, users.c.name.label("user_name")))))
+    }
+
+async def main(iterations: int, company_count: int):
+    await database.connect()
+    try:
+        # Самые «тяжелые» карточки — компании с наибольшим числом отзывов
+        rows = await database.fetch_all(
+            "SELECT company_id FROM company_stats ORDER BY review_count DESC LIMIT :limit",
+            values={"limit": company_count}
+        )
+        company_ids = [row["company_id"] for row in rows]
+        if not company_ids:
+            raise SystemExit("В БД нет компаний, сначала заполните ее данными")
+
+        legacy, single = [], []
+        for i in range(iterations):
+            company_id = company_ids[i % len(company_ids)]
+            # Варианты чередуются, чтобы оба работали в одинаковом состоянии кеша БД
+            _, duration = await timed(legacy_company_detail, company_id)
+            legacy.append(duration)
+            _, duration = await timed(fetch_company_detail, company_id)
+            single.append(duration)
+    finally:
+        await database.disconnect()
+
+    report = {"legacy_4_queries": summarize(legacy), "single_query": summarize(single)}
+    report["p50_speedup"] = round(report["legacy_4_queries"]["p50_ms"] / report["single_query"]["p50_ms"], 2)
+    report["p99_speedup"] = round(report["legacy_4_queries"]["p99_ms"] / report["single_query"]["p99_ms"], 2)
+    print_report(report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--companies", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.companies))
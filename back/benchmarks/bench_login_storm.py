@@ -0,0 +1,61 @@
+"""
+Задержка каталога во время шквала логинов. Сравниваются bcrypt в цикле событий
+(inline) и в пуле (PASSWORD_HASH_EXECUTOR). Нужна БД с пользователем user/user из migrations/0001_initial.sql.
+
+python -m benchmarks.bench_login_storm --logins 16 --duration 10
+"""
+import argparse
+import asyncio
+import time
+from utils import password_hash_pool
+from benchmarks.common import app_client, login, summarize, print_report
+
+
+async def catalog_latency(client, headers, duration: float):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/companies/", headers=headers, params={"limit": 10})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+async def login_storm(client, username: str, password: str, deadline: float):
+    logins = 0
+    while time.perf_counter() < deadline:
+        await login(client, username, password)
+        logins += 1
+    return logins
+
+async def run_phase(client, headers, args, logins: int):
+    deadline = time.perf_counter() + args.duration
+    storm = [asyncio.create_task(login_storm(client, args.username, args.password, deadline)) for _ in range(logins)]
+    latencies = await catalog_latency(client, headers, args.duration)
+    completed = sum(await asyncio.gather(*storm))
+    return {"catalog": summarize(latencies), "logins_per_second": round(completed / args.duration, 1)}
+
+async def main(args):
+    kind = password_hash_pool.kind
+    async with app_client() as client:
+        headers = await login(client, args.username, args.password)
+
+        report = {"baseline": await run_phase(client, headers, args, 0)}
+
+        password_hash_pool.kind = "inline"
+        report["storm_inline"] = await run_phase(client, headers, args, args.logins)
+
+        password_hash_pool.kind = kind
+        report["storm_" + kind] = await run_phase(client, headers, args, args.logins)
+        report["pool"] = password_hash_pool.stats()
+
+    password_hash_pool.shutdown()
+    print_report(report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=16, help="одновременных потоков логина")
+    parser.add_argument("--duration", type=float, default=10, help="длительность каждой фазы, с")
+    parser.add_argument("--username", default="user")
+    parser.add_argument("--password", default="user")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Поиск компаний (параметр q в GET /companies/) на большом каталоге.
+С флагом --seed в БД добавляется N синтетических компаний с услугами и проектами
+(владелец — отдельный пользователь bench-search), после чего пересчитывается сводка.
+
+python -m benchmarks.bench_search --seed 100000
+python -m benchmarks.bench_search --iterations 50
+"""
+import argparse
+import asyncio
+from database import database
+from stats import rebuild_company_stats
+from api.company import find_companies
+from benchmarks.common import summarize, timed, print_report
+
+QUERIES = ["разработка", "мобильн прилож", "Компания 4217", "Компния 4217", "аудит безопасности", "crm"]
+
+WORDS = ["разработка", "сайтов", "мобильных", "приложений", "аудит", "безопасности", "дизайн",
+    "интеграция", "crm", "облачные", "сервисы", "поддержка", "аналитика", "данных", "тестирование"]
+
+SEED_QUERIES = [
+    """
+    INSERT INTO users (email, hashed_password, role, name, phone_number)
+    VALUES ('bench-search', '-', 'company', 'Бенчмарк поиска', '')
+    ON CONFLICT (email) DO NOTHING
+    """,
+    """
+    INSERT INTO companies (name, rating, user_id, email, inn, phone_number, staff, description, site)
+    SELECT 'Компания ' || g, 0, u.id, 'c' || g || '@bench.local', '7743013901', '', 1 + g % 500,
+        (SELECT string_agg(w, ' ') FROM (SELECT w FROM unnest(CAST(:words AS text[])) w WHERE g > 0 ORDER BY random() LIMIT 6) t),
+        'https://c' || g || '.bench.local'
+    FROM generate_series(1, :count) g, users u
+    WHERE u.email = 'bench-search'
+    """,
+    """
+    INSERT INTO services (name, price, company_id)
+    SELECT (CAST(:words AS text[]))[1 + (c.id + k) % cardinality(CAST(:words AS text[]))] || ' ' || k, 1000 + (c.id * k) % 90000, c.id
+    FROM companies c JOIN users u ON u.id = c.user_id, generate_series(1, 5) k
+    WHERE u.email = 'bench-search'
+    """,
+    """
+    INSERT INTO projects (name, description, company_id)
+    SELECT 'Проект ' || k || ' ' || (CAST(:words AS text[]))[1 + (c.id * k) % cardinality(CAST(:words AS text[]))], NULL, c.id
+    FROM companies c JOIN users u ON u.id = c.user_id, generate_series(1, 3) k
+    WHERE u.email = 'bench-search'
+    """,
+]
+
+async def seed(count: int):
+    async with database.transaction():
+        for query in SEED_QUERIES:
+            values = {}
+            if ":words" in query:
+                values["words"] = WORDS
+            if ":count" in query:
+                values["count"] = count
+            await database.execute(query, values=values or None)
+    await rebuild_company_stats()
+    await database.execute("ANALYZE")
+
+async def main(args):
+    await database.connect()
+    try:
+        if args.seed:
+            await seed(args.seed)
+
+        total = await database.fetch_val("SELECT count(*) FROM companies")
+        report = {"companies": total}
+        for q in QUERIES:
+            latencies = []
+            for _ in range(args.iterations):
+                _, duration = await timed(find_companies, None, None, q, None, None, None, None, 10, 0, None)
+                latencies.append(duration)
+            report[q] = summarize(latencies)
+    finally:
+        await database.disconnect()
+
+    print_report(report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0, help="добавить N синтетических компаний")
+    parser.add_argument("--iterations", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
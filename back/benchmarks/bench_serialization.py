@@ -0,0 +1,92 @@
+"""
+Процессорное время на сериализацию ответа каталога и карточки компании:
+прежний путь (проверка строк моделью pydantic + jsonable_encoder + json) против
+FastJSONResponse (строки сразу в JSON, orjson при наличии). БД не нужна, данные синтетические.
+
+python -m benchmarks.bench_serialization --rows 1000 --iterations 200
+"""
+import argparse
+import gzip
+import time
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from schemas import CompanyListModel, ServiceModel, ProjectModel, ReviewModel
+from responses import FastJSONResponse, orjson
+from benchmarks.common import summarize, print_report
+
+
+def catalog_rows(count: int):
+    return [{
+        "id": i,
+        "name": f"Компания {i}",
+        "rating": Decimal("4.35"),
+        "description": "Разработка сайтов и мобильных приложений, аудит безопасности, интеграция CRM",
+        "site": f"https://company-{i}.example",
+        "min_price": Decimal("15000.00"),
+        "max_price": Decimal("120000.00"),
+        "review_count": 17,
+        "project_count": 8,
+        "user_name": "Владелец организации",
+    } for i in range(count)]
+
+def company_detail(count: int):
+    return {
+        "id": 1, "name": "Компания 1", "rating": Decimal("4.35"), "description": "Описание",
+        "staff": 120, "email": "c@example.com", "inn": "7743013901", "phone_number": "+79990000000",
+        "user_id": 3, "user_name": "Владелец", "min_price": Decimal("1000.00"), "max_price": Decimal("90000.00"),
+        "site": "https://company.example", "review_count": count,
+        "services": [{"id": i, "name": f"Услуга {i}", "price": 1000.0 + i} for i in range(count)],
+        "projects": [{"id": i, "name": f"Проект {i}", "description": "Описание проекта"} for i in range(count)],
+        "reviews": [{"id": i, "content": "Все сделали в срок", "rating": 5, "company_id": 1,
+            "user_id": i, "user_name": f"Пользователь {i}"} for i in range(count)],
+    }
+
+def old_catalog(rows):
+    # response_model=list[CompanyListModel]: проверка каждой строки, затем jsonable_encoder и json.dumps
+    return JSONResponse(jsonable_encoder([CompanyListModel(**row) for row in rows])).body
+
+def old_detail(company):
+    # Прежний fetch_company_detail строил модели для вложенных списков, response_model=dict
+    company = dict(company,
+        services=[ServiceModel(**x) for x in company["services"]],
+        projects=[ProjectModel(**x) for x in company["projects"]],
+        reviews=[ReviewModel(**x) for x in company["reviews"]],
+    )
+    return JSONResponse(jsonable_encoder(company)).body
+
+def new_response(content):
+    return FastJSONResponse(content).body
+
+def measure(func, payload, iterations: int):
+    durations = []
+    for _ in range(iterations):
+        started = time.process_time()
+        body = func(payload)
+        durations.append(time.process_time() - started)
+    return body, durations
+
+def main(args):
+    cases = {
+        "catalog": (catalog_rows(args.rows), old_catalog),
+        "company_detail": (company_detail(args.rows), old_detail),
+    }
+    report = {"rows": args.rows, "orjson": orjson is not None}
+    for name, (payload, old) in cases.items():
+        _, old_durations = measure(old, payload, args.iterations)
+        new_body, new_durations = measure(new_response, payload, args.iterations)
+        old_summary, new_summary = summarize(old_durations), summarize(new_durations)
+        report[name] = {
+            "old": old_summary,
+            "new": new_summary,
+            "cpu_saved_ms": round(old_summary["mean_ms"] - new_summary["mean_ms"], 3),
+            "bytes": len(new_body),
+            "gzip_bytes": len(gzip.compress(new_body, compresslevel=6)),
+        }
+    print_report(report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,54 @@
+"""
+Время импорта приложения и запуска (подключение к БД).
+Импорт замеряется в отдельных процессах, БД для него не нужна.
+
+python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from benchmarks.common import summarize, print_report
+
+
+def import_time():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], check=True)
+    return time.perf_counter() - started
+
+def slowest_imports(limit: int = 10):
+    """Самые медленные модули по данным python -X importtime (собственное время, мкс)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+        check=True, capture_output=True, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        modules.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return sorted(modules, key=lambda m: m["self_us"], reverse=True)[:limit]
+
+async def boot_time():
+    from main import app
+
+    started = time.perf_counter()
+    await app.router.startup()
+    duration = time.perf_counter() - started
+    await app.router.shutdown()
+    return duration
+
+async def main(args):
+    report = {
+        "import": summarize([import_time() for _ in range(args.runs)]),
+        "slowest_imports": slowest_imports(),
+    }
+    if not args.skip_boot:
+        report["boot"] = summarize([await boot_time() for _ in range(args.runs)])
+    print_report(report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--skip-boot", action="store_true", help="не замерять запуск (нужна БД)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,56 @@
+"""
+Общие функции бенчмарков.
+Запускаются из каталога back на заполненной БД: python -m benchmarks.<имя_модуля>
+"""
+import json
+import math
+import time
+from contextlib import asynccontextmanager
+
+
+def percentile(values: list, p: float):
+    """Перцентиль p (0-100) по отсортированной выборке, ближайший ранг"""
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))
+    return values[index]
+
+def summarize(latencies: list):
+    """Сводка по задержкам в секундах: количество и перцентили в миллисекундах"""
+    return {
+        "count": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+    }
+
+async def timed(func, *args, **kwargs):
+    """Выполняет корутину и возвращает (результат, длительность в секундах)"""
+    started = time.perf_counter()
+    result = await func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def print_report(report: dict):
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+
+@asynccontextmanager
+async def app_client():
+    """HTTP-клиент, который обращается к приложению в этом же процессе, без сети"""
+    import httpx
+    from main import app
+    from database import database
+
+    await database.connect()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            yield client
+    finally:
+        await database.disconnect()
+
+async def login(client, username: str, password: str):
+    """Возвращает заголовки авторизации для пользователя"""
+    response = await client.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": "Bearer " + response.json()["access_token"]}
@@ -0,0 +1,108 @@
+"""
+Планы горячих запросов каталога, карточки компании и отзывов: EXPLAIN (ANALYZE, BUFFERS)
+на данных из benchmarks/generate_dataset.py.
+
+С флагом --without запросы выполняются дважды: как есть и внутри транзакции, в которой
+перечисленные индексы удалены (транзакция откатывается). Так видно, что дает каждый индекс.
+DROP INDEX блокирует таблицу до конца транзакции — запускать только на локальной БД.
+
+python -m benchmarks.explain_queries
+python -m benchmarks.explain_queries --without services_name_price_idx,services_price_idx
+"""
+import argparse
+import asyncio
+import json
+from database import database
+from models import reviews, users
+from api.company import catalog_query, COMPANY_DETAIL_QUERY, DETAIL_REVIEWS_LIMIT
+from querylog import compile_query
+from benchmarks.common import print_report
+
+
+async def sample_values():
+    """Параметры запросов из реальных данных: популярные услуги и компания с большим числом отзывов"""
+    top_services = [row["name"] for row in await database.fetch_all(
+        "SELECT name FROM service_names ORDER BY usage_count DESC LIMIT 2"
+    )]
+    rare_service = await database.fetch_val("SELECT name FROM service_names ORDER BY usage_count, name LIMIT 1")
+    busy_company = await database.fetch_val(
+        "SELECT company_id FROM company_stats ORDER BY review_count DESC, company_id LIMIT 1"
+    )
+    return top_services, rare_service, busy_company
+
+def hot_queries(top_services: list, rare_service: str, company_id: int):
+    """Запросы в том виде, в каком их выполняют api/company.py и api/review.py"""
+    def catalog(**filters):
+        params = dict(service_name=None, company_name=None, q=None, min_price=None, max_price=None,
+            min_projects=None, min_rating=None, limit=10, offset=0, cursor=None)
+        params.update(filters)
+        return compile_query(catalog_query(**params))
+
+    reviews_page = (
+        reviews.join(users, reviews.c.user_id == users.c.id)
+            .select()
+            .where(reviews.c.company_id == company_id)
+            .with_only_columns(reviews, users.c.name.label("user_name"))
+            .order_by(reviews.c.id.desc())
+            .limit(20)
+    )
+
+    return {
+        "каталог без фильтров": catalog(),
+        "каталог, популярные услуги": catalog(service_name=top_services),
+        "каталог, редкая услуга": catalog(service_name=[rare_service]),
+        "каталог, диапазон цен": catalog(min_price=10000, max_price=30000),
+        "каталог, услуга и цена": catalog(service_name=top_services[:1], max_price=50000),
+        "каталог, рейтинг от 4": catalog(min_rating=4),
+        "карточка компании": (COMPANY_DETAIL_QUERY, {"company_id": company_id, "reviews_limit": DETAIL_REVIEWS_LIMIT}),
+        "отзывы компании": compile_query(reviews_page),
+    }
+
+async def explain(sql: str, values: dict):
+    plan = await database.fetch_val(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", values)
+    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+    return plan
+
+def describe(node: dict, depth: int = 0):
+    """Дерево плана в компактном текстовом виде"""
+    target = node.get("Index Name") or node.get("Relation Name") or ""
+    line = f"{'  ' * depth}{node['Node Type']} {target}".rstrip()
+    line += f" (строк {node.get('Actual Rows')}, {node.get('Actual Total Time')} мс, буферов {node.get('Shared Hit Blocks', 0) + node.get('Shared Read Blocks', 0)})"
+    lines = [line]
+    for child in node.get("Plans", []):
+        lines.extend(describe(child, depth + 1))
+    return lines
+
+async def explain_all(queries: dict):
+    report = {}
+    for title, (sql, values) in queries.items():
+        plan = await explain(sql, values)
+        report[title] = {
+            "execution_ms": plan["Execution Time"],
+            "plan": describe(plan["Plan"]),
+        }
+    return report
+
+async def main(args):
+    await database.connect()
+    try:
+        queries = hot_queries(*await sample_values())
+        report = {"with_indexes": await explain_all(queries)}
+
+        if args.without:
+            transaction = await database.transaction()
+            try:
+                for index in args.without.split(","):
+                    await database.execute(f'DROP INDEX public."{index.strip()}"')
+                report["without: " + args.without] = await explain_all(queries)
+            finally:
+                await transaction.rollback()
+    finally:
+        await database.disconnect()
+
+    print_report(report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--without", help="индексы через запятую, которые временно удаляются для сравнения")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,208 @@
+"""
+Синтетический набор данных для нагрузочного теста (benchmarks/load_test.py).
+Распределения неравномерные, как в живом каталоге: популярность названий услуг и число
+отзывов подчиняются степенному закону, цены — логнормальному, оценки смещены к 4-5.
+
+Все записи принадлежат пользователям с адресами load-*@bench.local и удаляются флагом --clean.
+Пароль у всех пользователей одинаковый (--password), хеш вычисляется один раз.
+
+python -m benchmarks.generate_dataset --companies 10000 --users 5000 --seed 1
+python -m benchmarks.generate_dataset --clean
+"""
+import argparse
+import asyncio
+import random
+import time
+from database import database
+from stats import rebuild_company_stats, rebuild_service_names
+from utils import get_password_hash
+
+EMAIL_DOMAIN = "bench.local"
+BATCH_SIZE = 5000
+
+SERVICE_KINDS = ["Разработка", "Поддержка", "Аудит", "Дизайн", "Тестирование", "Внедрение",
+    "Интеграция", "Консалтинг", "Администрирование", "Миграция", "Аналитика", "Оптимизация"]
+SERVICE_SUBJECTS = ["сайтов", "мобильных приложений", "CRM", "ERP", "интернет-магазинов",
+    "облачной инфраструктуры", "баз данных", "информационной безопасности", "API", "чат-ботов"]
+DESCRIPTION_WORDS = ["разработка", "сайтов", "мобильных", "приложений", "аудит", "безопасности",
+    "дизайн", "интеграция", "crm", "облачные", "сервисы", "поддержка", "аналитика", "данных",
+    "тестирование", "команда", "опыт", "проектов", "заказчиков", "сроки"]
+REVIEW_TEXTS = ["Все сделали в срок", "Хорошая команда", "Были задержки, но результат устроил",
+    "Рекомендую", "Качество могло быть выше", "Отличная поддержка после запуска"]
+RATING_WEIGHTS = [5, 5, 15, 35, 40]  # оценки 1..5
+
+INSERT_USERS = """
+INSERT INTO users (email, hashed_password, role, name, phone_number)
+SELECT email, :hashed_password, :role, name, ''
+FROM unnest(CAST(:emails AS text[]), CAST(:names AS text[])) AS u(email, name)
+RETURNING id
+"""
+
+INSERT_COMPANIES = """
+INSERT INTO companies (name, rating, user_id, email, inn, phone_number, staff, description, site)
+SELECT name, 0, user_id, email, '7743013901', '', staff, description, site
+FROM unnest(CAST(:names AS text[]), CAST(:user_ids AS bigint[]), CAST(:emails AS text[]),
+    CAST(:staff AS bigint[]), CAST(:descriptions AS text[]), CAST(:sites AS text[]))
+    AS c(name, user_id, email, staff, description, site)
+RETURNING id
+"""
+
+INSERT_SERVICES = """
+INSERT INTO services (company_id, name, price)
+SELECT * FROM unnest(CAST(:company_ids AS bigint[]), CAST(:names AS text[]), CAST(:prices AS float8[]))
+"""
+
+INSERT_PROJECTS = """
+INSERT INTO projects (company_id, name, description)
+SELECT company_id, name, NULL FROM unnest(CAST(:company_ids AS bigint[]), CAST(:names AS text[])) AS p(company_id, name)
+"""
+
+INSERT_REVIEWS = """
+INSERT INTO reviews (company_id, user_id, rating, content)
+SELECT * FROM unnest(CAST(:company_ids AS bigint[]), CAST(:user_ids AS bigint[]),
+    CAST(:ratings AS bigint[]), CAST(:contents AS text[]))
+"""
+
+CLEAN_QUERIES = [
+    """
+    CREATE TEMP TABLE bench_companies ON COMMIT DROP AS
+    SELECT c.id FROM companies c JOIN users u ON u.id = c.user_id WHERE u.email LIKE :pattern
+    """,
+    "DELETE FROM reviews WHERE company_id IN (SELECT id FROM bench_companies) OR user_id IN (SELECT id FROM users WHERE email LIKE :pattern)",
+    "DELETE FROM services WHERE company_id IN (SELECT id FROM bench_companies)",
+    "DELETE FROM projects WHERE company_id IN (SELECT id FROM bench_companies)",
+    "DELETE FROM company_stats WHERE company_id IN (SELECT id FROM bench_companies)",
+    "DELETE FROM companies WHERE id IN (SELECT id FROM bench_companies)",
+    "DELETE FROM users WHERE email LIKE :pattern",
+]
+
+
+def email(kind: str, i: int):
+    return f"load-{kind}-{i}@{EMAIL_DOMAIN}"
+
+def zipf_weights(count: int, exponent: float):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+def pareto_count(rng: random.Random, mean: float, limit: int):
+    """Степенное распределение со средним около mean: у большинства мало, у немногих очень много"""
+    alpha = 1.5
+    value = (mean * (alpha - 1) / alpha) * rng.paretovariate(alpha)
+    return min(limit, int(value))
+
+def weighted_sample(rng: random.Random, population: list, weights: list, k: int):
+    """k различных элементов с вероятностью, пропорциональной весу"""
+    k = min(k, len(population))
+    chosen = set()
+    while len(chosen) < k:
+        chosen.update(rng.choices(population, weights, k=k - len(chosen)))
+    return list(chosen)
+
+async def insert_batches(query: str, columns: dict, constants: dict = None):
+    """Вставляет столбцы одинаковой длины пачками по BATCH_SIZE, возвращает id, если запрос их отдает"""
+    ids = []
+    total = len(next(iter(columns.values())))
+    for start in range(0, total, BATCH_SIZE):
+        values = {name: column[start:start + BATCH_SIZE] for name, column in columns.items()}
+        values.update(constants or {})
+        if "RETURNING" in query:
+            ids.extend(row["id"] for row in await database.fetch_all(query, values))
+        else:
+            await database.execute(query, values)
+    return ids
+
+async def generate(args):
+    rng = random.Random(args.seed)
+    hashed_password = get_password_hash(args.password)
+    service_catalog = [f"{kind} {subject}" for subject in SERVICE_SUBJECTS for kind in SERVICE_KINDS]
+    rng.shuffle(service_catalog)
+    service_weights = zipf_weights(len(service_catalog), 1.1)
+
+    async with database.transaction():
+        reviewer_ids = await insert_batches(INSERT_USERS, {
+            "emails": [email("user", i) for i in range(args.users)],
+            "names": [f"Пользователь {i}" for i in range(args.users)],
+        }, {"hashed_password": hashed_password, "role": "user"})
+        # Отдельные пользователи без отзывов: load_test пишет отзывы от их имени
+        await insert_batches(INSERT_USERS, {
+            "emails": [email("writer", i) for i in range(args.writers)],
+            "names": [f"Автор {i}" for i in range(args.writers)],
+        }, {"hashed_password": hashed_password, "role": "user"})
+        owner_ids = await insert_batches(INSERT_USERS, {
+            "emails": [email("owner", i) for i in range(args.companies)],
+            "names": [f"Владелец {i}" for i in range(args.companies)],
+        }, {"hashed_password": hashed_password, "role": "company"})
+
+        company_ids = await insert_batches(INSERT_COMPANIES, {
+            "names": [f"Компания {i}" for i in range(args.companies)],
+            "user_ids": owner_ids,
+            "emails": [f"company-{i}@{EMAIL_DOMAIN}" for i in range(args.companies)],
+            "staff": [max(1, int(rng.lognormvariate(3, 1.2))) for _ in range(args.companies)],
+            "descriptions": [" ".join(rng.sample(DESCRIPTION_WORDS, 6)) for _ in range(args.companies)],
+            "sites": [f"https://company-{i}.{EMAIL_DOMAIN}" for i in range(args.companies)],
+        })
+
+        services = {"company_ids": [], "names": [], "prices": []}
+        projects = {"company_ids": [], "names": []}
+        reviews = {"company_ids": [], "user_ids": [], "ratings": [], "contents": []}
+        for company_id in company_ids:
+            for name in weighted_sample(rng, service_catalog, service_weights, 1 + pareto_count(rng, args.services - 1, 40)):
+                services["company_ids"].append(company_id)
+                services["names"].append(name)
+                services["prices"].append(round(rng.lognormvariate(10.5, 0.8), -2))
+            for k in range(pareto_count(rng, args.projects, 200)):
+                projects["company_ids"].append(company_id)
+                projects["names"].append(f"Проект {k + 1}")
+            for user_id in rng.sample(reviewer_ids, pareto_count(rng, args.reviews, len(reviewer_ids))):
+                reviews["company_ids"].append(company_id)
+                reviews["user_ids"].append(user_id)
+                reviews["ratings"].append(rng.choices(range(1, 6), RATING_WEIGHTS)[0])
+                reviews["contents"].append(rng.choice(REVIEW_TEXTS))
+
+        await insert_batches(INSERT_SERVICES, services)
+        await insert_batches(INSERT_PROJECTS, projects)
+        await insert_batches(INSERT_REVIEWS, reviews)
+
+    await rebuild_company_stats(company_ids)
+    await rebuild_service_names()
+    await database.execute("ANALYZE")
+
+    return {
+        "companies": len(company_ids),
+        "users": len(reviewer_ids),
+        "writers": args.writers,
+        "services": len(services["names"]),
+        "projects": len(projects["names"]),
+        "reviews": len(reviews["user_ids"]),
+    }
+
+async def clean():
+    async with database.transaction():
+        for query in CLEAN_QUERIES:
+            await database.execute(query, {"pattern": f"load-%@{EMAIL_DOMAIN}"})
+    await rebuild_service_names()
+
+async def main(args):
+    await database.connect()
+    try:
+        started = time.perf_counter()
+        if args.clean:
+            await clean()
+            print("Синтетические данные удалены")
+        else:
+            counts = await generate(args)
+            print(f"Создано за {time.perf_counter() - started:.1f} с:", counts)
+    finally:
+        await database.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--companies", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=5000, help="пользователи, оставляющие отзывы")
+    parser.add_argument("--writers", type=int, default=100, help="пользователи без отзывов для записи в load_test")
+    parser.add_argument("--services", type=float, default=6, help="среднее число услуг у компании")
+    parser.add_argument("--projects", type=float, default=8, help="среднее число проектов у компании")
+    parser.add_argument("--reviews", type=float, default=12, help="среднее число отзывов у компании")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--clean", action="store_true", help="удалить ранее созданные данные")
+    asyncio.run(main(parser.parse_args()))
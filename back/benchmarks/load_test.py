@@ -0,0 +1,209 @@
+"""
+Нагрузочный тест: параллельные клиенты обращаются к приложению в этом же процессе
+(без сети) на данных из benchmarks/generate_dataset.py.
+
+Смесь запросов задается весами: вход (/token), каталог со случайным набором фильтров,
+карточка компании (популярные компании запрашиваются чаще) и запись отзыва с последующим
+удалением, чтобы данные не менялись от прогона к прогону.
+
+Отчет — JSON с пропускной способностью и p50/p95/p99 по каждому типу запроса.
+Флаг --compare печатает разницу с сохраненным ранее отчетом.
+
+python -m benchmarks.load_test --concurrency 32 --duration 60 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime
+from collections import defaultdict, Counter
+from database import database
+from benchmarks.common import app_client, login, summarize, print_report
+from benchmarks.generate_dataset import EMAIL_DOMAIN, email, zipf_weights
+
+DEFAULT_MIX = "token=1,catalog=10,detail=10,review=2"
+PRICE_BOUNDS = [1000, 10000, 30000, 60000, 100000]
+SEARCH_QUERIES = ["разработка", "мобильных приложений", "аудит безопасности", "crm", "Компания 42"]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def request(self, endpoint: str, call):
+        started = time.perf_counter()
+        response = await call
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        self.statuses[endpoint][response.status_code] += 1
+        return response
+
+    def report(self, duration: float):
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            statuses = self.statuses[endpoint]
+            endpoints[endpoint] = {
+                **summarize(latencies),
+                "throughput_rps": round(len(latencies) / duration, 2),
+                "errors": sum(count for status, count in statuses.items() if status >= 500),
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            }
+        total = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {"total": {**summarize(total), "throughput_rps": round(len(total) / duration, 2)}, "endpoints": endpoints}
+
+
+class Scenario:
+    """Набор данных, из которого клиенты выбирают параметры запросов"""
+    def __init__(self, rng: random.Random, company_ids: list, service_names: list, users: int, writers: int, password: str):
+        self.rng = rng
+        self.company_ids = company_ids
+        self.company_weights = zipf_weights(len(company_ids), 0.9)
+        self.service_names = service_names
+        self.users = users
+        self.writers = writers
+        self.password = password
+
+    def company_id(self):
+        return self.rng.choices(self.company_ids, self.company_weights)[0]
+
+    def catalog_params(self):
+        """Случайная комбинация фильтров каталога, как у реальных посетителей"""
+        rng = self.rng
+        params = {"limit": rng.choice([10, 10, 20, 50])}
+        if rng.random() < 0.4 and self.service_names:
+            params["service_name"] = rng.sample(self.service_names, min(len(self.service_names), rng.choice([1, 1, 2])))
+        if rng.random() < 0.3:
+            low, high = sorted(rng.sample(PRICE_BOUNDS, 2))
+            params["min_price"], params["max_price"] = low, high
+        if rng.random() < 0.2:
+            params["min_rating"] = rng.choice([3, 4])
+        if rng.random() < 0.15:
+            params["min_projects"] = rng.choice([1, 5, 10])
+        if rng.random() < 0.15:
+            params["q"] = rng.choice(SEARCH_QUERIES)
+        if rng.random() < 0.2:
+            params["offset"] = params["limit"] * rng.randint(1, 5)
+        return params
+
+async def load_scenario(args, rng: random.Random):
+    company_ids = [row["id"] for row in await database.fetch_all(
+        "SELECT c.id FROM companies c JOIN users u ON u.id = c.user_id WHERE u.email LIKE :pattern ORDER BY c.id",
+        {"pattern": f"load-owner-%@{EMAIL_DOMAIN}"},
+    )]
+    if not company_ids:
+        raise SystemExit("Нет синтетических данных, сначала запустите python -m benchmarks.generate_dataset")
+    # Популярность не должна совпадать с порядком id
+    rng.shuffle(company_ids)
+    service_names = [row["name"] for row in await database.fetch_all(
+        "SELECT name FROM service_names ORDER BY usage_count DESC LIMIT 50"
+    )]
+    users = await database.fetch_val("SELECT count(*) FROM users WHERE email LIKE :pattern", {"pattern": f"load-user-%@{EMAIL_DOMAIN}"})
+    writers = await database.fetch_val("SELECT count(*) FROM users WHERE email LIKE :pattern", {"pattern": f"load-writer-%@{EMAIL_DOMAIN}"})
+    if not users or not writers:
+        raise SystemExit("В наборе данных нет пользователей, пересоздайте его с --users и --writers больше нуля")
+    return Scenario(rng, company_ids, service_names, users, writers, args.password)
+
+async def client_loop(number: int, client, scenario: Scenario, mix: dict, recorder: Recorder, deadline: float):
+    rng = random.Random(scenario.rng.random())
+    # Каждый клиент — отдельный автор отзывов, чтобы не упираться в ограничение «один отзыв на компанию»
+    headers = await login(client, email("writer", number % scenario.writers), scenario.password)
+    kinds, weights = list(mix), list(mix.values())
+
+    while time.perf_counter() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "token":
+            username = email("user", rng.randrange(scenario.users))
+            await recorder.request("POST /token", client.post("/token", data={"username": username, "password": scenario.password}))
+        elif kind == "catalog":
+            await recorder.request("GET /companies/", client.get("/companies/", params=scenario.catalog_params(), headers=headers))
+        elif kind == "detail":
+            await recorder.request("GET /companies/{id}", client.get(f"/companies/{scenario.company_id()}", headers=headers))
+        elif kind == "review":
+            company_id = scenario.company_id()
+            response = await recorder.request("POST /companies/{id}/reviews/", client.post(
+                f"/companies/{company_id}/reviews/",
+                json={"content": "Отзыв нагрузочного теста", "rating": rng.randint(1, 5)},
+                headers=headers,
+            ))
+            if response.status_code == 200:
+                review_id = response.json()["id"]
+                await recorder.request("DELETE /companies/{id}/reviews/{id}", client.delete(
+                    f"/companies/{company_id}/reviews/{review_id}", headers=headers,
+                ))
+
+def parse_mix(value: str):
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight or 1)
+    unknown = set(mix) - {"token", "catalog", "detail", "review"}
+    if unknown:
+        raise SystemExit(f"Неизвестные типы запросов: {', '.join(sorted(unknown))}")
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+def compare(report: dict, baseline: dict):
+    """Изменение перцентилей и пропускной способности относительно baseline, в процентах"""
+    diff = {}
+    for endpoint, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous:
+            continue
+        diff[endpoint] = {
+            key: f"{(current[key] - previous[key]) / previous[key] * 100:+.1f}%"
+            for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+            if current.get(key) is not None and previous.get(key)
+        }
+    return diff
+
+async def main(args):
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    async with app_client() as client:
+        scenario = await load_scenario(args, rng)
+        recorder = Recorder()
+
+        # Прогрев: соединения пула, кеши и планы запросов
+        warmup_deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(
+            client_loop(i, client, scenario, mix, Recorder(), warmup_deadline) for i in range(args.concurrency)
+        ))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client_loop(i, client, scenario, mix, recorder, started + args.duration) for i in range(args.concurrency)
+        ))
+        duration = time.perf_counter() - started
+
+        report = {
+            "started_at": datetime.utcnow().isoformat(),
+            "config": {
+                "concurrency": args.concurrency,
+                "duration_s": args.duration,
+                "mix": mix,
+                "seed": args.seed,
+                "companies": len(scenario.company_ids),
+            },
+            "pool": database.pool_stats(),
+            **recorder.report(duration),
+        }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["compare"] = compare(report, json.load(f))
+    print_report(report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="длительность замера, с")
+    parser.add_argument("--warmup", type=float, default=5, help="длительность прогрева, с")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="веса типов запросов: token, catalog, detail, review")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="сохранить отчет в файл")
+    parser.add_argument("--compare", help="сравнить с ранее сохраненным отчетом")
+    asyncio.run(main(parser.parse_args()))
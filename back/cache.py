@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import secrets
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    LRU-кеш в памяти процесса с временем жизни записей
+    и ограничениями по количеству записей и их суммарному объему.
+    """
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None, size: int = None):
+        if size is None:
+            size = approx_size(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), size, value)
+        self._bytes += size
+
+        # Вытесняем самые давно использованные записи
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, key):
+        if key in self._entries:
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+def approx_size(value):
+    """Приблизительный объем объекта в памяти: рекурсивно по словарям, спискам и моделям"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approx_size(v) for v in value)
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + approx_size(vars(value))
+    return sys.getsizeof(value)
+
+
+# Кеш карточек компаний (GET /companies/{company_id})
+company_cache = LRUCache(
+    max_entries=int(os.environ.get("COMPANY_CACHE_SIZE", 1000)),
+    max_bytes=int(os.environ.get("COMPANY_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.environ.get("COMPANY_CACHE_TTL", 60)),
+)
+
+# Кеш результатов каталога (GET /companies/) по набору фильтров
+catalog_cache = LRUCache(
+    max_entries=int(os.environ.get("CATALOG_CACHE_SIZE", 500)),
+    max_bytes=int(os.environ.get("CATALOG_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+    ttl=float(os.environ.get("CATALOG_CACHE_TTL", 30)),
+)
+
+# Владельцы компаний: company_id -> user_id. Владелец не меняется, запись удаляется вместе с компанией
+company_owners = LRUCache(
+    max_entries=int(os.environ.get("COMPANY_OWNER_CACHE_SIZE", 100000)),
+    max_bytes=int(os.environ.get("COMPANY_OWNER_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+    ttl=float(os.environ.get("COMPANY_OWNER_CACHE_TTL", 24 * 3600)),
+)
+
+# Версия каталога, увеличивается при любом изменении компаний
+_catalog_version = 0
+
+def catalog_version():
+    return _catalog_version
+
+def bump_catalog_version():
+    global _catalog_version
+    _catalog_version += 1
+
+# Версии компаний, увеличиваются при каждом изменении.
+# Карточка кладется в кеш, только если версия не изменилась за время чтения из БД.
+_company_versions = {}
+
+def company_version(company_id: int):
+    return _company_versions.get(company_id, 0)
+
+def invalidate_company(company_id: int):
+    """Сбрасывает закешированные данные компании. Вызывается после фиксации изменений"""
+    _company_versions[company_id] = company_version(company_id) + 1
+    company_cache.invalidate(company_id)
+    bump_catalog_version()
+
+def invalidate_all():
+    """Сбрасывает все закешированные данные компаний и каталога"""
+    global _generation
+    _generation += 1
+    company_cache.clear()
+    bump_catalog_version()
+
+# ETag собирается из версий без обращения к БД. Версии живут в памяти процесса, поэтому в ETag входят:
+# - идентификатор запуска: ETag, выданный другим процессом или до перезапуска, никогда не совпадет;
+# - поколение, которое увеличивает invalidate_all (например, смена имени пользователя видна во всех карточках);
+# - номер интервала длиной ETAG_MAX_AGE: изменения, сделанные другими процессами, становятся видны
+#   не позже, чем через ETAG_MAX_AGE секунд. Интервал задается отдельно от TTL кешей: с выключенным
+#   кешем (TTL 0) ETag не должен становиться вечным.
+BOOT_ID = secrets.token_hex(4)
+_generation = 0
+ETAG_MAX_AGE = max(1.0, float(os.environ.get("ETAG_MAX_AGE", 60)))
+
+def make_etag(*parts):
+    epoch = int(time.time() // ETAG_MAX_AGE)
+    return '"' + "-".join(str(part) for part in (BOOT_ID, _generation, *parts, epoch)) + '"'
+
+def company_etag(company_id: int):
+    """ETag карточки компании и ее услуг, проектов и отзывов"""
+    return make_etag("c", company_id, company_version(company_id))
+
+def catalog_etag():
+    """ETag страниц каталога; фильтры входят в URL, поэтому в ETag их нет"""
+    return make_etag("l", catalog_version())
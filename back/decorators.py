@@ -2,12 +2,15 @@ from fastapi import HTTPException, Depends, status
 from functools import wraps
 from utils import get_current_user
 from database import database
+from cache import company_owners
 
 def role_required(allowed_roles: list):
     """
     Декоратор для проверки роли пользователя.
     :param allowed_roles: список допустимых ролей, например ["admin", "company"]
     """
+    allowed_roles = frozenset(allowed_roles)
+
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
@@ -21,6 +24,22 @@ def role_required(allowed_roles: list):
         return wrapper
     return decorator
 
+def roles_allowed(allowed_roles: list):
+    """
+    Зависимость для проверки роли пользователя без обертки обработчика.
+    :param allowed_roles: список допустимых ролей, например ["admin"]
+    """
+    allowed_roles = frozenset(allowed_roles)
+
+    async def dependency(current_user: dict = Depends(get_current_user)):
+        if current_user.get("role") not in allowed_roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="У вас нет прав для выполнения данного действия"
+            )
+        return current_user
+    return dependency
+
 def is_company_owner():
     """
     Декоратор для проверки, является ли текущий пользователь владельцем компании.
@@ -32,19 +51,20 @@ def is_company_owner():
 
             if current_user["role"] != "admin":
                 if current_user["role"] == "company":
+                    # Компании пользователя на момент входа перечислены в токене
+                    if company_id in current_user.get("company_ids", ()):
+                        return await func(company_id=company_id, *args, **kwargs)
+
                     # Проверяем, владеет ли пользователь указанной компанией
-                    query = f"SELECT user_id FROM companies WHERE id = :company_id"
-                    result = await database.fetch_one(
-                        query, values={"company_id": company_id}
-                    )
+                    owner_id = await get_company_owner(company_id)
 
-                    if not result:
+                    if owner_id is None:
                         raise HTTPException(
                             status_code=404,
                             detail="Организация не найдена"
                         )
 
-                    if result["user_id"] != current_user["user_id"]:
+                    if owner_id != current_user["user_id"]:
                         raise HTTPException(
                             status_code=status.HTTP_403_FORBIDDEN,
                             detail="У вас нет прав для обновления данной огранизации"
@@ -58,4 +78,16 @@ def is_company_owner():
 
             return await func(company_id=company_id, *args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+async def get_company_owner(company_id: int):
+    """Возвращает id владельца компании (из кеша, при промахе из БД) или None"""
+    owner_id = company_owners.get(company_id)
+    if owner_id is None:
+        query = "SELECT user_id FROM companies WHERE id = :company_id"
+        result = await database.fetch_one(query, values={"company_id": company_id})
+        if not result:
+            return None
+        owner_id = result["user_id"]
+        company_owners.set(company_id, owner_id)
+    return owner_id
@@ -0,0 +1,35 @@
+import sys
+import json
+import asyncio
+import argparse
+from database import database
+from models import users
+from api.company import import_companies
+
+
+async def file_lines(path: str):
+    with open(path, "rb") as file:
+        for line in file:
+            yield line
+
+async def main(args):
+    await database.connect()
+    try:
+        owner = await database.fetch_one(users.select().where(users.c.email == args.email))
+        if not owner:
+            sys.exit("Пользователь не найден: " + args.email)
+
+        current_user = {"user_id": owner["id"], "role": owner["role"]}
+        summary = await import_companies(file_lines(args.path), current_user, args.batch_size)
+    finally:
+        await database.disconnect()
+
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+# Импорт компаний из NDJSON-файла: python import_companies.py companies.ndjson --email admin
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовый импорт компаний из NDJSON")
+    parser.add_argument("path", help="файл, одна компания (с services и projects) в строке")
+    parser.add_argument("--email", required=True, help="пользователь, от имени которого выполняется импорт")
+    parser.add_argument("--batch-size", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
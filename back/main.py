@@ -1,43 +1,74 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from sqlalchemy import select
+import os
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import select, func
 from asyncpg.exceptions import UniqueViolationError
-from database import database
-from models import users, services, companies
+from database import database, PoolTimeoutError
+from models import users, companies, service_names
 from schemas import UserCreate, TokenModel, UserModel, UserDetail, UserPasswordUpdate
-from utils import get_password_hash, verify_password, create_access_token
+from utils import get_password_hash_async, verify_password_async, create_access_token, password_hash_pool
 from datetime import timedelta
 from fastapi.security import OAuth2PasswordRequestForm
 from api import company, project, review, service
-from decorators import role_required
+from decorators import roles_allowed
 from utils import get_current_user, validate_phone_number, validate_email
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List
-from fastapi.staticfiles import StaticFiles
+from assets import static_files
+from responses import FastJSONResponse, APIGZipMiddleware, GZIP_MINIMUM_SIZE
+from cache import company_cache, catalog_cache, invalidate_all
+import metrics
+import querylog
+import migrate
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(APIGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+# Добавляется последним, чтобы оборачивать все остальные слои и учитывать полное время ответа
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(company.router, prefix="/companies", tags=["companies"])
 app.include_router(project.router, prefix="/companies/{company_id}/projects", tags=["projects"])
 app.include_router(review.router, prefix="/companies/{company_id}/reviews", tags=["reviews"])
 app.include_router(service.router, prefix="/companies/{company_id}/services", tags=["services"])
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Собранная статика (python assets.py): имена с хешем, сжатые варианты и долгий кеш
+app.mount("/static", static_files(), name="static")
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(status_code=503, content={"detail": "Сервер перегружен, повторите попытку позже"})
 
 @app.on_event("startup")
 async def startup():
     await database.connect()
+    # Применение миграций при старте включается явно (локальная разработка), обычно это отдельный шаг развертывания.
+    # Остальные воркеры не ждут блокировку: ожидающий воркер держал бы снимок, которого
+    # дожидается CREATE INDEX CONCURRENTLY у держателя блокировки, и они заблокировали бы друг друга
+    if os.environ.get("DB_MIGRATE") == "1":
+        await migrate.run("up", wait=False)
 
 @app.on_event("shutdown")
 async def shutdown():
     await database.disconnect()
+    password_hash_pool.shutdown()
+
+# Готовность принимать запросы: есть соединение с БД
+@app.get("/ready", response_model=dict)
+async def ready():
+    try:
+        await database.fetch_val("SELECT 1")
+    except Exception:
+        return JSONResponse(status_code=503, content={"status": "not ready"})
+    return {"status": "ready"}
 
 @app.post("/register", response_model=dict)
 async def register(user: UserCreate):
@@ -46,7 +77,7 @@ async def register(user: UserCreate):
     if not validate_phone_number(user.phone_number):
         raise HTTPException(status_code=400, detail="Невалидный номер телефона")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     query = users.insert().values(email=user.email, hashed_password=hashed_password, name=user.name, role=('company' if user.is_company else 'user'), phone_number=user.phone_number)
 
     try:
@@ -60,24 +91,30 @@ async def register(user: UserCreate):
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     query = users.select().where(users.c.email == form_data.username)
     user = await database.fetch_one(query)
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    if not user or not await verify_password_async(form_data.password, user["hashed_password"]):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Логин/пароль введены неверно")
+
+    # Компании владельца попадают в токен, чтобы проверка прав не обращалась к БД
+    company_ids = []
+    if user["role"] == "company":
+        company_ids = [row["id"] for row in await database.fetch_all(select(companies.c.id).where(companies.c.user_id == user["id"]))]
+
     access_token = create_access_token(data={"user_id": user["id"],
         "sub": user["email"], 
         "role": user["role"],
         "phone_number": user["phone_number"],
-        "name": user["name"]}, expires_delta=timedelta(hours=16))
+        "name": user["name"],
+        "company_ids": company_ids}, expires_delta=timedelta(hours=16))
     return {"access_token": access_token, "id": user["id"], "role": user["role"], "token_type": "bearer"}
 
 @app.get("/users", response_model=list[UserModel])
-@role_required(["admin"])
-async def get_users(current_user: dict = Depends(get_current_user)):
+async def get_users(current_user: dict = Depends(roles_allowed(["admin"]))):
     query = users.select()
     return await database.fetch_all(query)
 
 @app.put("/users", response_model=dict)
 async def change_password(data: UserPasswordUpdate, current_user: dict = Depends(get_current_user)):
-    hashed_password = get_password_hash(data.password)
+    hashed_password = await get_password_hash_async(data.password)
     query = users.update().where(users.c.id == current_user["user_id"]).values(hashed_password=hashed_password)
     await database.execute(query)
     
@@ -101,10 +138,74 @@ async def change_user(data: dict, current_user: dict = Depends(get_current_user)
         phone_number = data['phone_number'])
 
     await database.execute(query)
+
+    # Имя пользователя выводится в каталоге, карточках его компаний и в отзывах
+    invalidate_all()
     
     return {"message": "Данные пользователя успешно обновлены"}
 
 @app.get("/services", response_model=List[dict])
 async def all_unique_services(current_user: dict = Depends(get_current_user)):
-    query = select(services.c.name).distinct()
-    return list(map(lambda x: {'name': x['name']}, await database.fetch_all(query))) 
\ No newline at end of file
+    query = (
+        select(service_names.c.name)
+            .where(service_names.c.usage_count > 0)
+            .order_by(service_names.c.name)
+    )
+    return [{'name': row['name']} for row in await database.fetch_all(query)]
+
+# Автодополнение названий услуг по префиксу, популярные первыми
+@app.get("/services/suggest", response_model=List[dict])
+async def suggest_services(
+    prefix: str = "",
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: dict = Depends(get_current_user)
+):
+    pattern = prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    query = (
+        select(service_names.c.name, service_names.c.usage_count)
+            .where(func.lower(service_names.c.name).like(pattern))
+            .where(service_names.c.usage_count > 0)
+            .order_by(service_names.c.usage_count.desc(), service_names.c.name)
+            .limit(limit)
+            .offset(offset)
+    )
+    return [{'name': row['name'], 'usage_count': row['usage_count']} for row in await database.fetch_all(query)]
+
+@app.get("/cache/stats", response_model=dict)
+async def cache_stats(current_user: dict = Depends(roles_allowed(["admin"]))):
+    return {"company_detail": company_cache.stats(), "catalog": catalog_cache.stats()}
+
+@app.get("/auth/stats", response_model=dict)
+async def auth_stats(current_user: dict = Depends(roles_allowed(["admin"]))):
+    return {"password_hashing": password_hash_pool.stats()}
+
+def collect_gauges():
+    gauges = metrics.stats_gauges("db_pool", "Состояние пула соединений с БД", database.pool_stats())
+    for name, cache in (("company_detail", company_cache), ("catalog", catalog_cache)):
+        gauges += metrics.stats_gauges("cache", "Состояние кэшей", cache.stats(), {"cache": name})
+    gauges += metrics.stats_gauges("password_hashing", "Состояние пула хеширования паролей", password_hash_pool.stats())
+    return gauges
+
+metrics.register_gauges(collect_gauges)
+
+# Метрики в формате Prometheus, закрываются на уровне сети, а не токеном, чтобы их мог читать сборщик
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/db/stats", response_model=dict)
+async def db_stats(current_user: dict = Depends(roles_allowed(["admin"]))):
+    return {"pool": database.pool_stats()}
+
+@app.get("/db/slow-queries", response_model=dict)
+async def slow_queries(
+    limit: int = Query(20, ge=1, le=querylog.SLOW_QUERY_LOG_SIZE),
+    with_plan: bool = False,
+    current_user: dict = Depends(roles_allowed(["admin"])),
+):
+    return {
+        "threshold_ms": querylog.SLOW_QUERY_MS,
+        "explain_rate": querylog.SLOW_QUERY_EXPLAIN_RATE,
+        "queries": querylog.recent(limit, with_plan),
+    }
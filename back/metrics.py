@@ -0,0 +1,165 @@
+import time
+import contextvars
+from database import database
+
+# Границы корзин гистограмм
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels: tuple):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.series = {}  # labels -> value
+
+    def inc(self, labels: tuple = (), value: float = 1):
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.series.items():
+            lines.append(f"{self.name}{format_labels(labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}  # labels -> [счетчики по корзинам, сумма, количество]
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self.series.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{format_labels(labels + (('le', bound),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+request_duration = Histogram("http_request_duration_seconds", "Длительность обработки запроса")
+requests_total = Counter("http_requests_total", "Количество запросов по статусам ответа")
+request_db_queries = Histogram("http_request_db_queries", "Количество запросов к БД на один HTTP-запрос", QUERY_COUNT_BUCKETS)
+request_db_duration = Histogram("http_request_db_duration_seconds", "Суммарное время запросов к БД на один HTTP-запрос")
+db_query_duration = Histogram("db_query_duration_seconds", "Длительность запросов к БД")
+
+METRICS = [request_duration, requests_total, request_db_queries, request_db_duration, db_query_duration]
+
+# Источники мгновенных значений: функции, возвращающие [(имя, описание, метки, значение)]
+_gauge_collectors = []
+
+def register_gauges(collector):
+    _gauge_collectors.append(collector)
+
+def stats_gauges(prefix: str, help: str, stats: dict, labels: dict = None):
+    """Числовые поля словаря stats() как набор мгновенных значений"""
+    return [
+        (f"{prefix}_{key}", help, labels or {}, value)
+        for key, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+
+
+class RequestStats:
+    """Стоимость текущего HTTP-запроса: маршрут и обращения к БД"""
+    __slots__ = ("scope", "db_queries", "db_time")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.db_queries = 0
+        self.db_time = 0.0
+
+    @property
+    def route(self):
+        # Роутер записывает маршрут в scope до вызова обработчика, поэтому он известен уже во время запросов к БД
+        return route_label(self.scope)
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+def observe_query(query, values, duration: float):
+    db_query_duration.observe((), duration)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += duration
+
+database.add_query_listener(observe_query)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: задержка, статусы и стоимость в БД по каждому маршруту"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            labels = (("method", scope["method"]), ("route", stats.route))
+            request_duration.observe(labels, time.perf_counter() - started)
+            requests_total.inc(labels + (("status", status_code),))
+            request_db_queries.observe(labels, stats.db_queries)
+            request_db_duration.observe(labels, stats.db_time)
+
+def route_label(scope):
+    """Шаблон пути маршрута, чтобы /companies/1 и /companies/2 попадали в одну серию"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope["path"].startswith("/static"):
+        return "/static"
+    return "unmatched"
+
+def render():
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+
+    gauges = {}
+    for collector in _gauge_collectors:
+        for name, help, labels, value in collector():
+            gauges.setdefault((name, help), []).append((tuple(labels.items()), value))
+    for (name, help), series in gauges.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in series:
+            lines.append(f"{name}{format_labels(labels)} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,152 @@
+"""
+Версионные миграции схемы БД из каталога migrations/.
+
+Файлы NNNN_описание.sql применяются по порядку номеров, каждый в своей транзакции,
+примененные версии записываются в таблицу schema_migrations. Файл с первой строкой
+«-- migrate: no-transaction» выполняется вне транзакции по одной команде
+(нужно для CREATE INDEX CONCURRENTLY).
+
+python migrate.py                  — применить новые миграции
+python migrate.py status           — показать примененные и ожидающие
+python migrate.py baseline 0001    — отметить миграции до 0001 включительно как примененные,
+                                     не выполняя их
+
+БД, созданная раньше из script.sql, соответствует только 0001: ее отмечают через
+baseline 0001, а остальные миграции (сводка company_stats, поиск, словарь услуг, индексы)
+применяют обычным up.
+"""
+import os
+import re
+import sys
+import asyncio
+import hashlib
+from database import database
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+NO_TRANSACTION = "-- migrate: no-transaction"
+# Ключ advisory-блокировки: миграции не выполняются параллельно из нескольких процессов
+LOCK_KEY = 7_254_301
+
+CREATE_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS public.schema_migrations (
+    version varchar(4) NOT NULL,
+    "name" varchar(255) NOT NULL,
+    checksum varchar(64) NOT NULL,
+    applied_at timestamptz DEFAULT now() NOT NULL,
+    CONSTRAINT schema_migrations_pk PRIMARY KEY (version)
+)
+"""
+
+
+class Migration:
+    def __init__(self, version: str, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+
+    @property
+    def transactional(self):
+        return not self.sql.startswith(NO_TRANSACTION)
+
+    def statements(self):
+        """Команды файла по отдельности; в миграциях нет функций и строк с «;»"""
+        lines = [line for line in self.sql.splitlines() if not line.lstrip().startswith("--")]
+        return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+def load_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append(Migration(match.group(1), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise SystemExit("Несколько файлов миграций с одним номером")
+    return migrations
+
+async def applied_migrations(connection):
+    rows = await connection.fetch("SELECT version, checksum FROM schema_migrations")
+    return {row["version"]: row["checksum"] for row in rows}
+
+async def record(connection, migration: Migration):
+    await connection.execute(
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)",
+        migration.version, migration.name, migration.checksum,
+    )
+
+async def apply(connection, migration: Migration):
+    if migration.transactional:
+        async with connection.transaction():
+            # Без параметров asyncpg выполняет весь файл одним простым запросом
+            await connection.execute(migration.sql)
+            await record(connection, migration)
+    else:
+        for statement in migration.statements():
+            await connection.execute(statement)
+        await record(connection, migration)
+
+def check_changed(migrations: list, applied: dict):
+    for migration in migrations:
+        if migration.version in applied and applied[migration.version] != migration.checksum:
+            print(f"Внимание: файл {migration.version}_{migration.name}.sql изменен после применения")
+
+async def run(command: str = "up", argument: str = None, wait: bool = True):
+    """Выполняет команду миграций на уже подключенной database (используется и при старте приложения).
+    С wait=False не ждет блокировку: если миграции уже выполняет другой процесс, возвращает False"""
+    migrations = load_migrations()
+    async with database.connection() as connection:
+        raw = connection.raw_connection
+        if wait:
+            await raw.execute("SELECT pg_advisory_lock($1)", LOCK_KEY)
+        elif not await raw.fetchval("SELECT pg_try_advisory_lock($1)", LOCK_KEY):
+            print("Миграции выполняет другой процесс, пропуск")
+            return False
+        try:
+            await raw.execute(CREATE_TABLE_QUERY)
+            applied = await applied_migrations(raw)
+            check_changed(migrations, applied)
+            pending = [migration for migration in migrations if migration.version not in applied]
+
+            if command == "status":
+                for migration in migrations:
+                    state = "применена" if migration.version in applied else "ожидает"
+                    print(f"{migration.version} {migration.name}: {state}")
+            elif command == "baseline":
+                if not argument:
+                    raise SystemExit("Укажите номер последней уже примененной миграции")
+                for migration in pending:
+                    if migration.version <= argument:
+                        await record(raw, migration)
+                        print(f"{migration.version} {migration.name}: отмечена как примененная")
+            elif command == "up":
+                if not pending:
+                    print("Новых миграций нет")
+                for migration in pending:
+                    print(f"{migration.version} {migration.name}...")
+                    await apply(raw, migration)
+            else:
+                raise SystemExit(f"Неизвестная команда: {command}")
+        finally:
+            await raw.execute("SELECT pg_advisory_unlock($1)", LOCK_KEY)
+    return True
+
+async def main(command: str, argument: str = None):
+    await database.connect()
+    try:
+        await run(command, argument)
+    finally:
+        await database.disconnect()
+
+# Команда и число ее аргументов
+COMMANDS = {"up": 0, "status": 0, "baseline": 1}
+
+if __name__ == "__main__":
+    command, *arguments = sys.argv[1:] or ["up"]
+    if COMMANDS.get(command) != len(arguments):
+        print(__doc__.strip())
+        sys.exit(2)
+    asyncio.run(main(command, *arguments))
@@ -1,3 +1,5 @@
+-- Исходная схема: пользователи, компании, услуги, проекты, отзывы
+
 CREATE TABLE public.users (
 	id int8 GENERATED BY DEFAULT AS IDENTITY( INCREMENT BY 1 MINVALUE 1 MAXVALUE 9223372036854775807 START 1 CACHE 1 NO CYCLE) NOT NULL,
 	email varchar(255) NOT NULL,
@@ -64,4 +66,4 @@ CREATE TABLE public.reviews (
 	CONSTRAINT reviews_unique UNIQUE (user_id,company_id),
 	CONSTRAINT reviews_users_fk FOREIGN KEY (user_id) REFERENCES public.users(id) ON DELETE CASCADE,
 	CONSTRAINT reviews_companies_fk FOREIGN KEY (company_id) REFERENCES public.companies(id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
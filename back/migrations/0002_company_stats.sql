@@ -0,0 +1,46 @@
+-- Сводка по компании для каталога, поддерживается приложением (stats.py)
+CREATE TABLE public.company_stats (
+	company_id int8 NOT NULL,
+	min_price numeric(15, 2) NULL,
+	max_price numeric(15, 2) NULL,
+	project_count int8 DEFAULT 0 NOT NULL,
+	review_count int8 DEFAULT 0 NOT NULL,
+	rating_sum int8 DEFAULT 0 NOT NULL,
+	rating numeric(4, 2) DEFAULT 0 NOT NULL,
+	search_name varchar(255) NULL,
+	search_vector tsvector NULL,
+	CONSTRAINT company_stats_pk PRIMARY KEY (company_id),
+	CONSTRAINT company_stats_companies_fk FOREIGN KEY (company_id) REFERENCES public.companies(id) ON DELETE CASCADE
+);
+
+-- Сортировка каталога и keyset-пагинация по (rating, id)
+CREATE INDEX company_stats_rating_idx ON public.company_stats USING btree (rating DESC, company_id DESC);
+
+-- Сводка для уже заполненной БД; запрос повторяет REFRESH_QUERY из stats.py
+WITH fresh AS (
+	INSERT INTO public.company_stats (company_id, min_price, max_price, project_count, review_count, rating_sum, rating,
+		search_name, search_vector)
+	SELECT c.id, s.min_price, s.max_price, coalesce(p.project_count, 0), coalesce(r.review_count, 0),
+		coalesce(r.rating_sum, 0), coalesce(round(r.rating_sum::numeric / r.review_count, 2), 0),
+		c."name",
+		setweight(to_tsvector('russian', c."name"), 'A')
+			|| setweight(to_tsvector('russian', coalesce(s.service_names, '')), 'B')
+			|| setweight(to_tsvector('russian', coalesce(p.project_names, '')), 'B')
+			|| setweight(to_tsvector('russian', coalesce(c.description, '')), 'C')
+	FROM public.companies c
+	LEFT JOIN (
+		SELECT company_id, min(price) AS min_price, max(price) AS max_price, string_agg("name", ' ') AS service_names
+		FROM public.services GROUP BY company_id
+	) s ON s.company_id = c.id
+	LEFT JOIN (
+		SELECT company_id, count(*) AS project_count, string_agg("name", ' ') AS project_names
+		FROM public.projects GROUP BY company_id
+	) p ON p.company_id = c.id
+	LEFT JOIN (
+		SELECT company_id, count(*) AS review_count, sum(rating) AS rating_sum FROM public.reviews GROUP BY company_id
+	) r ON r.company_id = c.id
+	RETURNING company_id, rating
+)
+UPDATE public.companies SET rating = fresh.rating
+FROM fresh
+WHERE companies.id = fresh.company_id AND companies.rating IS DISTINCT FROM fresh.rating;
@@ -0,0 +1,4 @@
+-- Поиск компаний: полнотекстовый по названию, услугам, проектам и описанию, нечеткий по названию
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX company_stats_search_vector_idx ON public.company_stats USING gin (search_vector);
+CREATE INDEX company_stats_search_name_idx ON public.company_stats USING gin (search_name gin_trgm_ops);
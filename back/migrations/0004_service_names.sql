@@ -0,0 +1,8 @@
+-- Словарь названий услуг для фильтра каталога и автодополнения, поддерживается приложением (stats.py)
+CREATE TABLE public.service_names (
+	"name" varchar(255) NOT NULL,
+	usage_count int8 DEFAULT 0 NOT NULL,
+	CONSTRAINT service_names_pk PRIMARY KEY ("name")
+);
+CREATE INDEX service_names_prefix_idx ON public.service_names USING btree (lower("name") text_pattern_ops);
+INSERT INTO public.service_names ("name", usage_count) SELECT "name", count(*) FROM public.services GROUP BY "name";
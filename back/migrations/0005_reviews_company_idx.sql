@@ -0,0 +1,2 @@
+-- Отзывы компании от новых к старым (список отзывов и карточка компании)
+CREATE INDEX reviews_company_id_idx ON public.reviews USING btree (company_id, id DESC);
@@ -0,0 +1,24 @@
+-- migrate: no-transaction
+-- Индексы под фильтры каталога (api/company.py, catalog_query). Создаются CONCURRENTLY,
+-- чтобы не блокировать запись в services на рабочей БД, поэтому миграция идет вне транзакции.
+-- Прерванное CONCURRENTLY оставляет индекс в состоянии INVALID, и IF NOT EXISTS молча пропустил бы его
+-- при повторном запуске. Поэтому перед созданием индекс удаляется.
+--
+-- Подзапрос фильтра по услугам: SELECT DISTINCT company_id FROM services
+-- WHERE name IN (...) [AND price BETWEEN ...]. Уникальный индекс (company_id, name) начинается
+-- с company_id и для него не подходит, без индекса это полный просмотр services.
+-- Индекс (name, price, company_id) рассчитан на Index Only Scan по нужным названиям;
+-- планы до и после можно снять на заполненной БД: python -m benchmarks.explain_queries --without services_name_price_idx,services_price_idx
+DROP INDEX CONCURRENTLY IF EXISTS public.services_name_price_idx;
+CREATE INDEX CONCURRENTLY services_name_price_idx ON public.services USING btree ("name", price, company_id);
+
+-- Тот же подзапрос только с диапазоном цен, без названий: рассчитан на Index Only Scan по диапазону.
+DROP INDEX CONCURRENTLY IF EXISTS public.services_price_idx;
+CREATE INDEX CONCURRENTLY services_price_idx ON public.services USING btree (price, company_id);
+
+-- Остальные горячие пути уже покрыты и отдельных индексов не требуют:
+--   ORDER BY rating DESC, id DESC и min_rating — company_stats_rating_idx (0002);
+--   отзывы компании и соединение reviews -> users — reviews_company_id_idx (0005) и users_pk;
+--   отзывы пользователя (проверка «один отзыв на компанию») — reviews_unique (user_id, company_id);
+--   услуги и проекты компании — services_unique и projects_unique, начинающиеся с company_id;
+--   компании владельца — companies_unique (user_id, name).
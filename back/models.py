@@ -1,5 +1,6 @@
 from sqlalchemy import Table, Column, Integer, String, ForeignKey, Float, Text
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from database import metadata
 
 users = Table(
@@ -55,3 +56,26 @@ reviews = Table(
     Column("company_id", Integer, ForeignKey("companies.id")),
     Column("user_id", Integer, ForeignKey("users.id")),
 )
+
+# Словарь названий услуг с количеством использований (см. stats.py)
+service_names = Table(
+    "service_names",
+    metadata,
+    Column("name", String(255), primary_key=True),
+    Column("usage_count", Integer, nullable=False, default=0),
+)
+
+# Денормализованная сводка по компании для каталога (см. stats.py)
+company_stats = Table(
+    "company_stats",
+    metadata,
+    Column("company_id", Integer, ForeignKey("companies.id"), primary_key=True),
+    Column("min_price", Float),
+    Column("max_price", Float),
+    Column("project_count", Integer, nullable=False, default=0),
+    Column("review_count", Integer, nullable=False, default=0),
+    Column("rating_sum", Integer, nullable=False, default=0),
+    Column("rating", Float, nullable=False, default=0),
+    Column("search_name", String(255)),
+    Column("search_vector", TSVECTOR),
+)
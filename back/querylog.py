@@ -0,0 +1,115 @@
+import os
+import re
+import time
+import json
+import random
+import asyncio
+import logging
+import contextvars
+from collections import deque
+from datetime import datetime, date
+from decimal import Decimal
+from sqlalchemy.sql import ClauseElement
+from sqlalchemy.dialects import postgresql
+from database import database
+from metrics import current_request
+
+logger = logging.getLogger("slow_query")
+
+# Порог медленного запроса, мс
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+# Доля медленных запросов, для которых снимается EXPLAIN (ANALYZE, BUFFERS); 0 — выключено
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get("SLOW_QUERY_EXPLAIN_RATE", "0"))
+# Сколько последних медленных запросов хранить для просмотра администратором
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", "100"))
+
+# EXPLAIN ANALYZE выполняет запрос, поэтому снимается только для чтения
+READ_ONLY_QUERY = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+DATA_MODIFYING = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b|\bFOR\s+(UPDATE|SHARE)\b", re.IGNORECASE)
+SECRET_PARAM = re.compile(r"password|token", re.IGNORECASE)
+
+# Диалект с именованными параметрами: скомпилированный запрос можно снова передать в database как строку
+_dialect = postgresql.dialect(paramstyle="named")
+
+slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_explaining = contextvars.ContextVar("explaining", default=False)
+_explain_tasks = set()
+_explain_in_flight = set()
+
+
+def compile_query(query, values: dict = None):
+    """SQL-текст и параметры запроса в том виде, в каком их можно повторить"""
+    if isinstance(query, ClauseElement):
+        # Списки IN (...) подставляются сразу, иначе в тексте остаются заглушки POSTCOMPILE
+        compiled = query.compile(dialect=_dialect, compile_kwargs={"render_postcompile": True})
+        return str(compiled), dict(compiled.params)
+    return str(query), dict(values or {})
+
+def loggable_params(params: dict):
+    return {
+        key: "***" if SECRET_PARAM.search(key) else loggable_value(value)
+        for key, value in params.items()
+    }
+
+def loggable_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        # Длинные массивы id не нужны целиком, чтобы понять план
+        items = [loggable_value(item) for item in value[:20]]
+        return items + [f"... еще {len(value) - 20}"] if len(value) > 20 else items
+    if isinstance(value, (Decimal, datetime, date)):
+        return str(value)
+    return repr(value)
+
+def is_explainable(sql: str):
+    return bool(READ_ONLY_QUERY.match(sql)) and not DATA_MODIFYING.search(sql)
+
+def observe_query(query, values, duration: float):
+    if duration * 1000 < SLOW_QUERY_MS or _explaining.get():
+        return
+
+    sql, params = compile_query(query, values)
+    stats = current_request.get()
+    entry = {
+        "time": datetime.utcnow().isoformat(),
+        "route": stats.route if stats is not None else None,
+        "duration_ms": round(duration * 1000, 2),
+        "sql": sql,
+        "params": loggable_params(params),
+        "plan": None,
+    }
+    slow_queries.append(entry)
+    logger.warning(
+        "Медленный запрос %.1f мс, маршрут %s: %s; параметры: %s",
+        entry["duration_ms"], entry["route"], sql, json.dumps(entry["params"], ensure_ascii=False),
+    )
+
+    if SLOW_QUERY_EXPLAIN_RATE > 0 and random.random() < SLOW_QUERY_EXPLAIN_RATE and is_explainable(sql):
+        # Один и тот же запрос не разбирается параллельно несколько раз
+        if sql in _explain_in_flight:
+            return
+        _explain_in_flight.add(sql)
+        # Пустой контекст: задача не унаследует соединение и транзакцию текущего запроса и получит свое из пула
+        task = contextvars.Context().run(asyncio.create_task, explain(entry, sql, params))
+        _explain_tasks.add(task)
+        task.add_done_callback(_explain_tasks.discard)
+
+async def explain(entry: dict, sql: str, params: dict):
+    _explaining.set(True)
+    started = time.perf_counter()
+    try:
+        plan = await database.fetch_val(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+        entry["plan"] = json.loads(plan) if isinstance(plan, str) else plan
+        entry["explain_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    except Exception as exc:
+        entry["plan_error"] = str(exc)
+    finally:
+        _explain_in_flight.discard(sql)
+
+def recent(limit: int = None, with_plan: bool = False):
+    """Последние медленные запросы, новые первыми"""
+    entries = [entry for entry in reversed(slow_queries) if entry["plan"] is not None or not with_plan]
+    return entries[:limit] if limit else entries
+
+database.add_query_listener(observe_query)
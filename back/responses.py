@@ -0,0 +1,80 @@
+"""
+Быстрая сериализация ответов API.
+
+Обработчики, которые возвращают много строк из БД, отдают готовый JSONResponse:
+FastAPI не проверяет его по response_model и не прогоняет через jsonable_encoder.
+Если установлен orjson, тело собирается им, иначе стандартным json.
+Для ресурсов с версией (cache.py) ответ сопровождается ETag, и повторный запрос
+с If-None-Match получает 304 без обращения к БД.
+"""
+import json
+from decimal import Decimal
+from datetime import date, datetime
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Браузер хранит ответ, но перед использованием перепроверяет его по ETag
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+# Ответы меньше этого размера не сжимаются: выигрыш меньше затрат
+GZIP_MINIMUM_SIZE = 1024
+# Потоковые ответы не сжимаются: GZipMiddleware копит фрагменты в буфере zlib,
+# и первые записи выгрузки доходили бы до клиента только после десятков КБ
+GZIP_EXCLUDED_PATHS = ("/static/", "/companies/export")
+
+
+def default(value):
+    """Типы, которые не умеет сериализовать JSON: numeric из БД, даты, модели pydantic"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "dict"):
+        return value.dict()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse, который принимает и готовое тело в байтах (например, из кеша)"""
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+def etag_headers(etag: str, headers: dict = None):
+    # Слабый ETag: одно и то же тело отдается и сжатым, и без сжатия, побайтово они различаются
+    return {**(headers or {}), "ETag": "W/" + etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+
+def not_modified(request: Request, etag: str):
+    """Ответ 304, если у клиента уже есть версия с этим ETag, иначе None"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    # Для If-None-Match допустимо слабое сравнение, поэтому префикс W/ не учитывается.
+    # «*» не проверяется: ETag строится без обращения к БД, и для несуществующей компании
+    # ответ должен дойти до 404, а не стать 304
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if etag in candidates:
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
+
+class APIGZipMiddleware(GZipMiddleware):
+    """Сжатие ответов API; статика уже лежит в сжатом виде (assets.py) и не сжимается повторно, выгрузка идет потоком"""
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(GZIP_EXCLUDED_PATHS):
+            return await self.app(scope, receive, send)
+        await super().__call__(scope, receive, send)
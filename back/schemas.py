@@ -40,6 +40,11 @@ class ServiceUpdate(BaseModel):
     name: str
     price: float
 
+class ServiceBatchUpdate(BaseModel):
+    id: int
+    name: str
+    price: float
+
 class ServiceModel(BaseModel):
     id: int
     name: str
@@ -54,6 +59,11 @@ class ProjectUpdate(BaseModel):
     name: str
     description: Optional[str]
 
+class ProjectBatchUpdate(BaseModel):
+    id: int
+    name: str
+    description: Optional[str]
+
 class ProjectModel(BaseModel):
     id: int
     name: str
@@ -126,6 +136,8 @@ class CompanyDetail(BaseModel):
     services: List[ServiceModel]
     projects: List[ProjectModel]
     reviews: List[ReviewModel]
+    review_count: int
+    reviews_cursor: Optional[str]
 
 class CompanyListModel(BaseModel):
     id: int
@@ -1,6 +1,9 @@
 let id = new URL(document.location).searchParams.get("id");
 let isEditing = false;
 let hideReviews = false;
+let reviews = []; // Загруженные отзывы, новые первыми
+let reviewsCursor = null; // Курсор следующей страницы отзывов
+let myReview = null; // Отзыв текущего пользователя, даже если он не попал в загруженные страницы
 
 if (id) {
   loadInfo();
@@ -56,7 +59,10 @@ async function loadInfo() {
     )
     .join("");
 
-  renderReviews(company.reviews);
+  reviews = company.reviews;
+  reviewsCursor = company.reviews_cursor;
+  await loadMyReview();
+  renderReviews();
 }
 
 document
@@ -314,20 +320,61 @@ async function deleteProfile() {
   }
 }
 
+// Первая страница отзывов заново (после добавления или удаления)
 async function loadReviews() {
-  let reviews = [];
   try {
-    reviews = (await axios.get("/companies/" + id + "/reviews")).data;
+    const response = await axios.get("/companies/" + id + "/reviews");
+    reviews = response.data;
+    reviewsCursor = response.headers["x-next-cursor"] ?? null;
   } catch (e) {
     notify(e.response.data.detail ?? e.response.data, "error");
     return;
   }
 
-  renderReviews(reviews);
+  await loadMyReview();
+  renderReviews();
 }
 
-function renderReviews(reviews) {
-  document.querySelector("#companyReviews").innerHTML = reviews
+// Следующая страница отзывов по курсору из предыдущего ответа
+async function loadMoreReviews() {
+  if (!reviewsCursor) return;
+
+  try {
+    const response = await axios.get("/companies/" + id + "/reviews", {
+      params: { cursor: reviewsCursor },
+    });
+    reviews = reviews.concat(response.data);
+    reviewsCursor = response.headers["x-next-cursor"] ?? null;
+  } catch (e) {
+    notify(e.response.data.detail ?? e.response.data, "error");
+    return;
+  }
+
+  renderReviews();
+}
+
+async function loadMyReview() {
+  myReview = null;
+  if (!userId || hideReviews) return;
+
+  try {
+    const response = await axios.get("/companies/" + id + "/reviews", {
+      params: { user_id: userId, limit: 1 },
+    });
+    myReview = response.data[0] ?? null;
+  } catch (e) {
+    notify(e.response.data.detail ?? e.response.data, "error");
+  }
+}
+
+function renderReviews() {
+  // Свой отзыв показывается первым, если его нет среди загруженных
+  const shown =
+    myReview && !reviews.some((r) => r.id == myReview.id)
+      ? [myReview, ...reviews]
+      : reviews;
+
+  document.querySelector("#companyReviews").innerHTML = shown
     .map(
       (r) => `<div class="col-12 col-md-6 col-lg-4">
             <div class="card h-100 shadow-sm">
@@ -357,8 +404,8 @@ function renderReviews(reviews) {
     )
     .join("");
 
-  document.getElementById("reviewSection").hidden =
-    hideReviews || reviews.find((r) => r.user_id == userId);
+  document.getElementById("moreReviewsButton").hidden = !reviewsCursor;
+  document.getElementById("reviewSection").hidden = hideReviews || !!myReview;
 }
 
 async function deleteReview(reviewId) {
@@ -0,0 +1,158 @@
+import sys
+import asyncio
+from database import database
+
+# Пересчет сводки company_stats. Агрегаты считаются по каждой таблице отдельно,
+# поэтому нет перемножения строк услуг, проектов и отзывов.
+# Поисковый документ: название компании, названия услуг и проектов, описание.
+# Рейтинг читается из сводки; companies.rating не обновляется: запись отзыва блокирует только
+# company_stats, и у нее нет обратного порядка блокировок с записью компании (companies -> company_stats).
+# Счетчики отзывов у существующей строки перезаписываются только при полном пересчете
+# (REVIEW_COLUMNS): при записи услуг и проектов их снимок может не включать отзыв,
+# зафиксированный параллельно, и затер бы его приращение из RATING_DELTA_CTE.
+REFRESH_QUERY = """
+INSERT INTO company_stats (company_id, min_price, max_price, project_count, review_count, rating_sum, rating,
+    search_name, search_vector)
+SELECT c.id, s.min_price, s.max_price, coalesce(p.project_count, 0), coalesce(r.review_count, 0),
+    coalesce(r.rating_sum, 0), coalesce(round(r.rating_sum::numeric / r.review_count, 2), 0),
+    c.name,
+    setweight(to_tsvector('russian', c.name), 'A')
+        || setweight(to_tsvector('russian', coalesce(s.service_names, '')), 'B')
+        || setweight(to_tsvector('russian', coalesce(p.project_names, '')), 'B')
+        || setweight(to_tsvector('russian', coalesce(c.description, '')), 'C')
+FROM companies c
+LEFT JOIN (
+    SELECT company_id, min(price) AS min_price, max(price) AS max_price, string_agg(name, ' ') AS service_names
+    FROM services GROUP BY company_id
+) s ON s.company_id = c.id
+LEFT JOIN (
+    SELECT company_id, count(*) AS project_count, string_agg(name, ' ') AS project_names
+    FROM projects GROUP BY company_id
+) p ON p.company_id = c.id
+LEFT JOIN (
+    SELECT company_id, count(*) AS review_count, sum(rating) AS rating_sum FROM reviews GROUP BY company_id
+) r ON r.company_id = c.id
+{where}
+ON CONFLICT (company_id) DO UPDATE SET
+    min_price = EXCLUDED.min_price,
+    max_price = EXCLUDED.max_price,
+    project_count = EXCLUDED.project_count,{review_columns}
+    search_name = EXCLUDED.search_name,
+    search_vector = EXCLUDED.search_vector
+"""
+
+REVIEW_COLUMNS = """
+    review_count = EXCLUDED.review_count,
+    rating_sum = EXCLUDED.rating_sum,
+    rating = EXCLUDED.rating,"""
+
+# Компании, у которых сводка разошлась с исходными таблицами
+VERIFY_QUERY = """
+SELECT c.id AS company_id
+FROM companies c
+LEFT JOIN company_stats cs ON cs.company_id = c.id
+LEFT JOIN (
+    SELECT company_id, min(price) AS min_price, max(price) AS max_price FROM services GROUP BY company_id
+) s ON s.company_id = c.id
+LEFT JOIN (
+    SELECT company_id, count(*) AS project_count FROM projects GROUP BY company_id
+) p ON p.company_id = c.id
+LEFT JOIN (
+    SELECT company_id, count(*) AS review_count, sum(rating) AS rating_sum FROM reviews GROUP BY company_id
+) r ON r.company_id = c.id
+WHERE cs.company_id IS NULL
+    OR cs.min_price IS DISTINCT FROM s.min_price
+    OR cs.max_price IS DISTINCT FROM s.max_price
+    OR cs.project_count <> coalesce(p.project_count, 0)
+    OR cs.review_count <> coalesce(r.review_count, 0)
+    OR cs.rating_sum <> coalesce(r.rating_sum, 0)
+    OR cs.rating <> coalesce(round(r.rating_sum::numeric / r.review_count, 2), 0)
+ORDER BY c.id
+"""
+
+# Изменение сводки и рейтинга на разницу, внесенную записью отзыва.
+# Подставляется в запрос после CTE delta(count_delta, sum_delta), чтобы
+# отзыв и рейтинг менялись одним выражением без пересчета AVG.
+RATING_DELTA_CTE = """
+stats AS (
+    UPDATE company_stats SET
+        review_count = company_stats.review_count + delta.count_delta,
+        rating_sum = company_stats.rating_sum + delta.sum_delta,
+        rating = CASE WHEN company_stats.review_count + delta.count_delta > 0
+            THEN round((company_stats.rating_sum + delta.sum_delta)::numeric / (company_stats.review_count + delta.count_delta), 2)
+            ELSE 0 END
+    FROM delta
+    WHERE company_stats.company_id = :company_id
+)
+"""
+
+# Изменение счетчиков словаря названий услуг. Строки с нулевым счетчиком
+# остаются в таблице и отфильтровываются при чтении, их убирает rebuild.
+SERVICE_NAMES_DELTA_QUERY = """
+INSERT INTO service_names AS sn (name, usage_count)
+SELECT name, delta FROM unnest(CAST(:names AS varchar[]), CAST(:deltas AS int8[])) AS d(name, delta)
+ON CONFLICT (name) DO UPDATE SET usage_count = sn.usage_count + EXCLUDED.usage_count
+"""
+
+REBUILD_SERVICE_NAMES_QUERIES = [
+    "DELETE FROM service_names",
+    "INSERT INTO service_names (name, usage_count) SELECT name, count(*) FROM services GROUP BY name",
+]
+
+async def refresh_company_stats(company_id: int):
+    """Пересчитывает сводку одной компании после записи услуг, проектов или самой компании. Счетчики отзывов не трогает"""
+    await database.execute(
+        REFRESH_QUERY.format(where="WHERE c.id = :company_id", review_columns=""),
+        values={"company_id": company_id}
+    )
+
+async def rebuild_company_stats(company_ids: list = None):
+    """Пересчитывает сводку всех (или указанных) компаний: первичное заполнение или восстановление"""
+    if company_ids is None:
+        await database.execute(REFRESH_QUERY.format(where="", review_columns=REVIEW_COLUMNS))
+    elif company_ids:
+        await database.execute(
+            REFRESH_QUERY.format(where="WHERE c.id = ANY(CAST(:company_ids AS bigint[]))", review_columns=REVIEW_COLUMNS),
+            values={"company_ids": company_ids}
+        )
+
+async def update_service_names(deltas: dict):
+    """Изменяет счетчики использования названий услуг: {название: изменение}"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Сортировка задает одинаковый порядок блокировок строк для параллельных транзакций
+    names = sorted(deltas)
+    await database.execute(SERVICE_NAMES_DELTA_QUERY, values={"names": names, "deltas": [deltas[name] for name in names]})
+
+async def rebuild_service_names():
+    """Пересчитывает словарь названий услуг по таблице services"""
+    async with database.transaction():
+        for query in REBUILD_SERVICE_NAMES_QUERIES:
+            await database.execute(query)
+
+async def verify_company_stats(repair: bool = False):
+    """Возвращает id компаний с расхождением сводки, при repair=True пересчитывает их"""
+    company_ids = [row["company_id"] for row in await database.fetch_all(VERIFY_QUERY)]
+    if repair:
+        await rebuild_company_stats(company_ids)
+    return company_ids
+
+async def main(command: str):
+    await database.connect()
+    try:
+        if command == "rebuild":
+            await rebuild_company_stats()
+            await rebuild_service_names()
+        else:
+            company_ids = await verify_company_stats(repair=command == "repair")
+            print(f"Расхождений: {len(company_ids)}", company_ids[:100])
+    finally:
+        await database.disconnect()
+
+# Запуск: python stats.py [rebuild|verify|repair]
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "rebuild"
+    if command not in ("rebuild", "verify", "repair"):
+        sys.exit("Использование: python stats.py [rebuild|verify|repair]")
+    asyncio.run(main(command))
@@ -2,10 +2,18 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from jose.exceptions import JWTError
 from datetime import datetime, timedelta
-from fastapi import Depends
+from fastapi import Depends, status
 from fastapi.security import OAuth2PasswordBearer
 import re
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import json
+import time
+import base64
+import hashlib
 from fastapi import HTTPException
+from cache import LRUCache
 
 SECRET_KEY = "secret_key"
 ALGORITHM = "HS256"
@@ -13,12 +21,108 @@ ALGORITHM = "HS256"
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Кеш проверенных токенов: sha256 токена -> claims. Запись живет не дольше срока действия токена
+token_cache = LRUCache(
+    max_entries=int(os.environ.get("TOKEN_CACHE_SIZE", 10000)),
+    max_bytes=int(os.environ.get("TOKEN_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+    ttl=float(os.environ.get("TOKEN_CACHE_TTL", 900)),
+)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHashPool:
+    """
+    Пул для bcrypt, чтобы хеширование не блокировало цикл событий.
+    Одновременно выполняется не больше workers операций, остальные ждут в очереди
+    длиной не больше max_queue, сверх нее запросы отклоняются с 503.
+    :param kind: "thread", "process" или "inline" (в цикле событий, для сравнения)
+    """
+    def __init__(self, workers: int, max_queue: int, kind: str = "thread"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self._executor = None
+        self._semaphore = None
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_waiting = 0
+        self.wait_time = 0.0
+
+    async def run(self, func, *args):
+        if self.kind == "inline":
+            self.completed += 1
+            return func(*args)
+
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите попытку позже",
+            )
+
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = time.perf_counter()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.wait_time += time.perf_counter() - started
+
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "max_waiting": self.max_waiting,
+            "wait_time": round(self.wait_time, 3),
+        }
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+password_hash_pool = PasswordHashPool(
+    workers=int(os.environ.get("PASSWORD_HASH_WORKERS", 4)),
+    max_queue=int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", 256)),
+    kind=os.environ.get("PASSWORD_HASH_EXECUTOR", "thread"),
+)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await password_hash_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -30,17 +134,27 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
     try:
-        SECRET_KEY = "secret_key"
-        ALGORITHM = "HS256"
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Не удалось проверить учетные данные",
         )
 
+    ttl = token_cache.ttl
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(key, payload, ttl=ttl)
+
+    return payload
+
 def validate_phone_number(phone):
     """Проверяет номер телефона на соответствие международному формату"""
     if phone == '':
@@ -77,4 +191,16 @@ def validate_inn(inn):
         if checksum_11 != int(inn[10]) or checksum_12 != int(inn[11]):
             return False, "Контрольная сумма не совпадает для ИНН длиной 12"
 
-    return True, ""
\ No newline at end of file
+    return True, ""
+
+def encode_cursor(values: list):
+    """Кодирует позицию keyset-пагинации в непрозрачную строку"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Раскодирует позицию keyset-пагинации, None для некорректного курсора"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    return values if isinstance(values, list) else None
\ No newline at end of file